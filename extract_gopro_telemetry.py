@@ -3,19 +3,77 @@ import os
 import subprocess
 import json
 
-def extract_telemetry_and_gpx(root_folder, exiftool_executable="exiftool", gpx_format_file="gpx.fmt"):
+import media_catalog
+import gpmf_streams
+
+
+def generate_gpx_for_clip(mp4_filepath):
+    """
+    Runs gopro2gpx on a single clip, writing <clip>.gpx and <clip>.csv next to it.
+
+    Returns the path of the GPX file on success, None otherwise. Raises
+    FileNotFoundError if gopro2gpx is not installed, since no other clip
+    will succeed either.
+    """
+    output_gpx_filepath = os.path.splitext(mp4_filepath)[0]
+
+    expected_gpx_output_path = f"{output_gpx_filepath}.gpx"
+
+    cmd_gpx = [
+        "gopro2gpx",
+        "--gpx",
+        "-s",              # Para skip bad points
+        mp4_filepath,
+        output_gpx_filepath
+    ]
+
+    print(f"Processing for GPX/CSV with gopro2gpx: {mp4_filepath}...")
+    try:
+
+        result_gpx = subprocess.run(cmd_gpx, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
+
+        # Verificamos si el archivo GPX fue creado
+        if os.path.exists(expected_gpx_output_path):
+            print(f"  SUCCESS: GPX file saved to {expected_gpx_output_path}")
+            return expected_gpx_output_path
+        else:
+            print(f"  WARNING: gopro2gpx ran but GPX file not found at {expected_gpx_output_path}.")
+            if result_gpx.stdout:
+                print(f"  gopro2gpx stdout: {result_gpx.stdout[:500]}")
+            if result_gpx.stderr:
+                print(f"  gopro2gpx stderr: {result_gpx.stderr[:500]}")
+
+    except subprocess.CalledProcessError as e:
+        print(f"  ERROR: gopro2gpx failed for {mp4_filepath}.")
+        print(f"  Return code: {e.returncode}")
+        print(f"  Stdout: {e.stdout[:500] if e.stdout else 'None'}")
+        print(f"  Stderr: {e.stderr[:500] if e.stderr else 'None'}")
+    except FileNotFoundError:
+        raise
+    except Exception as e_gpx:
+        print(f"  An unexpected error occurred during gopro2gpx execution for {mp4_filepath}: {e_gpx}")
+    return None
+
+
+def extract_telemetry_and_gpx(root_folder, exiftool_executable="exiftool", gpx_format_file="gpx.fmt", streams=None):
     """
     Scans a root folder for .MP4 files, extracts telemetry to JSON using ExifTool,
     and also generates a GPX file using ExifTool with a format file.
+    The worklist comes from the media catalog (see media_catalog.py), so only
+    directories that changed since the last run are listed again.
 
     Args:
         root_folder (str): The path to the folder to scan.
         exiftool_executable (str): The path to the ExifTool executable.
         gpx_format_file (str): Path to the gpx.fmt file for ExifTool.
+        streams (iterable): GPMF streams (e.g. "GPS5", "GPS9", "ACCL", "GYRO", "CORI")
+            to demux into <clip>_<STREAM>.csv files. All of them are read in a
+            single pass over the clip. None skips stream extraction.
     """
     print(f"Starting telemetry extraction and GPX generation from: {root_folder}")
     files_processed_json = 0
     files_processed_gpx = 0
+    files_processed_streams = 0
     files_found = 0
 
     if not os.path.basename(gpx_format_file) == gpx_format_file: # if it's a path
@@ -26,93 +84,79 @@ def extract_telemetry_and_gpx(root_folder, exiftool_executable="exiftool", gpx_f
              print(f"INFO: '{gpx_format_file}' not found in script directory. Assuming ExifTool can find it elsewhere (e.g., its own directory or current working directory of execution).")
 
 
-    for foldername, _, filenames in os.walk(root_folder):
-        for filename in filenames:
-            if filename.lower().endswith(".mp4"):
-                files_found += 1
-                mp4_filepath = os.path.join(foldername, filename)
-                base_filename = os.path.splitext(filename)[0]
-
-                # --- JSON Telemetry Extraction ---
-#                output_json_filepath = os.path.join(foldername, f"{base_filename}_telemetry.json")
-#                cmd_json = [
-#                    exiftool_executable,
-#                    "-ee",
-#                    "-n",
-#                    "-b",
-#                    "-G1",
-#                    "-x", "SourceFile",
-#                    "-x", "System:Directory",
-#                    "-json",
-#                    mp4_filepath
-#                ]
+    catalog = media_catalog.update_catalog(root_folder)
+    for mp4_filepath in media_catalog.files_of_kind(catalog, "clip"):
+        files_found += 1
+
+        # --- JSON Telemetry Extraction ---
+#        foldername, filename = os.path.split(mp4_filepath)
+#        base_filename = os.path.splitext(filename)[0]
+#        output_json_filepath = os.path.join(foldername, f"{base_filename}_telemetry.json")
+#        cmd_json = [
+#            exiftool_executable,
+#            "-ee",
+#            "-n",
+#            "-b",
+#            "-G1",
+#            "-x", "SourceFile",
+#            "-x", "System:Directory",
+#            "-json",
+#            mp4_filepath
+#        ]
 #
-#                print(f"\nProcessing for JSON: {mp4_filepath}...")
-#                try:
-#                    result_json = subprocess.run(cmd_json, capture_output=True, text=True, check=True, encoding='utf-8')
-#                    try:
-#                        metadata_list = json.loads(result_json.stdout)
-#                        if metadata_list and isinstance(metadata_list, list) and len(metadata_list) > 0:
-#                            with open(output_json_filepath, 'w', encoding='utf-8') as f_json:
-#                                json.dump(metadata_list[0], f_json, indent=4)
-#                            print(f"  SUCCESS: JSON telemetry saved to {output_json_filepath}")
-#                            files_processed_json += 1
-#                        else:
-#                            print(f"  WARNING: No valid metadata structure in ExifTool JSON output for {mp4_filepath}")
-#                    except json.JSONDecodeError:
-#                        print(f"  ERROR: Could not decode JSON from ExifTool for {mp4_filepath}")
-#                except subprocess.CalledProcessError as _:
-#                    print(f"  ERROR: ExifTool failed (JSON extraction) for {mp4_filepath}.")
-#                    # print(f"  Stderr: {e.stderr[:200]}...") # Uncomment for more error details
-#                except FileNotFoundError:
-#                    print(f"CRITICAL ERROR: ExifTool executable not found at '{exiftool_executable}'.")
-#                    return
-
-                # --- GPX File Generation ---
-                output_gpx_filepath = os.path.join(foldername, f"{base_filename}")
-
-                expected_gpx_output_path = f"{output_gpx_filepath}.gpx"
-
-                cmd_gpx = [
-                    "gopro2gpx",
-                    "--gpx",
-                    "-s",              # Para skip bad points
-                    mp4_filepath,
-                    output_gpx_filepath
-                ]
-
-                print(f"Processing for GPX/CSV with gopro2gpx: {mp4_filepath}...")
-                try:
-
-                    result_gpx = subprocess.run(cmd_gpx, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
-
-                    # Verificamos si el archivo GPX fue creado
-                    if os.path.exists(expected_gpx_output_path):
-                        print(f"  SUCCESS: GPX file saved to {expected_gpx_output_path}")
-                        files_processed_gpx += 1
-                    else:
-                        print(f"  WARNING: gopro2gpx ran but GPX file not found at {expected_gpx_output_path}.")
-                        if result_gpx.stdout:
-                            print(f"  gopro2gpx stdout: {result_gpx.stdout[:500]}")
-                        if result_gpx.stderr:
-                            print(f"  gopro2gpx stderr: {result_gpx.stderr[:500]}")
-
-                except subprocess.CalledProcessError as e:
-                    print(f"  ERROR: gopro2gpx failed for {mp4_filepath}.")
-                    print(f"  Return code: {e.returncode}")
-                    print(f"  Stdout: {e.stdout[:500] if e.stdout else 'None'}")
-                    print(f"  Stderr: {e.stderr[:500] if e.stderr else 'None'}")
-                except FileNotFoundError:
-                    print("CRITICAL ERROR: gopro2gpx command not found. Is it installed and in your PATH?")
-                    return
-                except Exception as e_gpx:
-                    print(f"  An unexpected error occurred during gopro2gpx execution for {mp4_filepath}: {e_gpx}")
+#        print(f"\nProcessing for JSON: {mp4_filepath}...")
+#        try:
+#            result_json = subprocess.run(cmd_json, capture_output=True, text=True, check=True, encoding='utf-8')
+#            try:
+#                metadata_list = json.loads(result_json.stdout)
+#                if metadata_list and isinstance(metadata_list, list) and len(metadata_list) > 0:
+#                    with open(output_json_filepath, 'w', encoding='utf-8') as f_json:
+#                        json.dump(metadata_list[0], f_json, indent=4)
+#                    print(f"  SUCCESS: JSON telemetry saved to {output_json_filepath}")
+#                    files_processed_json += 1
+#                else:
+#                    print(f"  WARNING: No valid metadata structure in ExifTool JSON output for {mp4_filepath}")
+#            except json.JSONDecodeError:
+#                print(f"  ERROR: Could not decode JSON from ExifTool for {mp4_filepath}")
+#        except subprocess.CalledProcessError as _:
+#            print(f"  ERROR: ExifTool failed (JSON extraction) for {mp4_filepath}.")
+#            # print(f"  Stderr: {e.stderr[:200]}...") # Uncomment for more error details
+#        except FileNotFoundError:
+#            print(f"CRITICAL ERROR: ExifTool executable not found at '{exiftool_executable}'.")
+#            return
+
+        # --- GPX File Generation ---
+        try:
+            if generate_gpx_for_clip(mp4_filepath):
+                files_processed_gpx += 1
+        except FileNotFoundError:
+            print("CRITICAL ERROR: gopro2gpx command not found. Is it installed and in your PATH?")
+            return
+
+        # --- GPMF Stream Extraction ---
+        if streams:
+            print(f"Extracting GPMF streams ({', '.join(streams)}): {mp4_filepath}...")
+            try:
+                outputs = gpmf_streams.extract_streams(mp4_filepath, streams)
+                for stream, output_path in outputs.items():
+                    print(f"  SUCCESS: {stream} saved to {output_path}")
+                missing = [stream for stream in streams if stream not in outputs]
+                if missing:
+                    print(f"  INFO: Streams not present in this clip: {', '.join(missing)}")
+                if outputs:
+                    files_processed_streams += 1
+            except gpmf_streams.GPMFError as e:
+                print(f"  WARNING: No GPMF telemetry in {mp4_filepath} ({e}).")
+            except Exception as e_streams:
+                print(f"  ERROR: GPMF stream extraction failed for {mp4_filepath}: {e_streams}")
 
 
     print("\n--- Summary ---")
     print(f"Found {files_found} MP4 files.")
     print(f"Successfully generated {files_processed_json} JSON telemetry files.")
     print(f"Successfully generated {files_processed_gpx} GPX files.")
+    if streams:
+        print(f"Successfully extracted GPMF streams from {files_processed_streams} files.")
     print("Extraction complete.")
 
 if __name__ == "__main__":
@@ -121,6 +165,8 @@ if __name__ == "__main__":
     exiftool_path = "exiftool"
 
     gpx_format_filepath = "gpx.fmt"
+    # GPMF streams to export as CSV (None to extract GPX only)
+    gpmf_streams_to_extract = ("GPS5", "GPS9", "ACCL", "GYRO", "CORI")
     # --- END CONFIGURATION ---
 
     if not os.path.exists(gpx_format_filepath) and gpx_format_filepath == "gpx.fmt":
@@ -132,4 +178,5 @@ if __name__ == "__main__":
 
     extract_telemetry_and_gpx(target_gopro_folder,
                                 exiftool_executable=exiftool_path,
-                                gpx_format_file=gpx_format_filepath)
+                                gpx_format_file=gpx_format_filepath,
+                                streams=gpmf_streams_to_extract)
@@ -1,13 +1,12 @@
-import gpxpy
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from datetime import timedelta
-import contextily as cx
-from pyproj import Transformer
+from datetime import timezone
 import numpy as np
+import itertools
 import os
 
-_local_ultima_elevacion_mostrada_texto = [None]
+import media_catalog
+import motor_render
+
 
 def animar_ruta_gpx_sincronizada(ruta_archivo_gpx,
                                  archivo_salida_video="ruta_animada_mapa_refinado.mp4",
@@ -20,221 +19,206 @@ def animar_ruta_gpx_sincronizada(ruta_archivo_gpx,
                                  grosor_linea=4,
                                  tamano_punto=10
                                  ):
-    global _local_ultima_elevacion_mostrada_texto
-    _local_ultima_elevacion_mostrada_texto[0] = None
-
+    """
+    Genera el vídeo transparente (sin mapa base) de la telemetría de un GPX.
+    Envoltorio de motor_render.renderizar_variantes con una sola variante.
+    """
+    variante = {"archivo_salida": archivo_salida_video, "map_source": None,
+                "grosor_linea": grosor_linea, "tamano_punto": tamano_punto}
+    resultados = motor_render.renderizar_variantes(
+        ruta_archivo_gpx,
+        [variante],
+        intervalo_frames_ms_referencia=intervalo_frames_ms_referencia,
+        puntos_gpx_por_frame_anim=puntos_gpx_por_frame_anim,
+        segundos_inicio_dibujo=segundos_inicio_dibujo,
+        ventana_promedio_altura_puntos=ventana_promedio_altura_puntos,
+        umbral_actualizacion_altura_m=umbral_actualizacion_altura_m
+    )
+    return resultados[archivo_salida_video]
+
+
+def _formato_tiempo_subtitulo(segundos, separador_ms):
+    ms_totales = int(round(segundos * 1000))
+    h, resto = divmod(ms_totales, 3600000)
+    m, resto = divmod(resto, 60000)
+    s, ms = divmod(resto, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{separador_ms}{ms:03d}"
+
+
+def _tiempos_iso_utc(tiempo_inicio, t_s):
+    """Convierte segundos desde tiempo_inicio a texto ISO 8601 UTC, vectorizado."""
+    if tiempo_inicio.tzinfo is not None:
+        tiempo_inicio = tiempo_inicio.astimezone(timezone.utc).replace(tzinfo=None)
+    tiempos = np.datetime64(tiempo_inicio, 'us') + np.round(t_s * 1e6).astype('timedelta64[us]')
+    return [f"{t}Z" for t in np.datetime_as_string(tiempos, unit='ms').tolist()]
+
+
+def exportar_telemetria_nle(ruta_archivo_gpx,
+                            prefijo_salida=None,
+                            fps_proyecto=29.97,
+                            segundos_inicio_dibujo=0,
+                            ventana_promedio_altura_puntos=5,
+                            umbral_actualizacion_altura_m=0.5,
+                            grosor_linea=4,
+                            tamano_figura=(10, 8),
+                            puntos_gpx_por_frame_anim=1,
+                            dpi=100
+                            ):
+    """
+    Exporta la telemetría como datos para que el editor la anime de forma
+    nativa, en lugar de renderizar un vídeo con transparencia:
+
+      <prefijo>-nle-frames.csv   Un registro por frame del proyecto: posición
+                                 del marcador (píxeles y normalizada estilo
+                                 Fusion), progreso de la ruta y altura.
+      <prefijo>-nle-altura.srt   Texto de altura como subtítulos.
+      <prefijo>-nle-altura.vtt   Lo mismo en WebVTT.
+      <prefijo>-nle-ruta.png     La ruta completa sobre fondo transparente, con
+                                 el mismo encuadre que las coordenadas del CSV.
+
+    Todo se calcula vectorizado sobre los arrays del track, así que el coste lo
+    domina la lectura del GPX y no la duración del vídeo.
+
+    La altura sigue las reglas del vídeo (motor_render.preparar_track) con el
+    mismo puntos_gpx_por_frame_anim: el umbral se evalúa por frame de la
+    animación y antes de la primera altura válida no hay texto (ni cue).
+    """
     try:
         print(f"Leyendo archivo GPX: {ruta_archivo_gpx}")
-        with open(ruta_archivo_gpx, 'r', encoding='utf-8') as gpx_file_content:
-            gpx = gpxpy.parse(gpx_file_content)
-
-        if not gpx.tracks or not gpx.tracks[0].segments:
-            print(f"No se encontraron tracks/segmentos en {ruta_archivo_gpx}.")
+        track = motor_render.cargar_track_proyectado(ruta_archivo_gpx)
+        if track is None:
             return False
-
-        all_points_raw_latlon = []
-        for segment in gpx.tracks[0].segments:
-            for point in segment.points:
-                if point.time and point.longitude is not None and point.latitude is not None:
-                    all_points_raw_latlon.append((point.longitude, point.latitude, point.time, point.elevation))
-
-        if not all_points_raw_latlon:
-            print(f"No se encontraron puntos con datos válidos en {ruta_archivo_gpx}.")
-            return False
-
-        print(f"Total de puntos GPX leídos de {os.path.basename(ruta_archivo_gpx)}: {len(all_points_raw_latlon)}")
-
-        transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
-        all_points_projected = []
-        for lon, lat, time, ele in all_points_raw_latlon:
-            x, y = transformer.transform(lon, lat)
-            all_points_projected.append((x, y, time, ele))
-
-        _all_points_data_for_animation = all_points_projected
-
-        if not _all_points_data_for_animation:
-            print(f"No quedaron puntos después de la proyección para {ruta_archivo_gpx}.")
-            return False
-
-        tiempo_primer_punto_gpx = _all_points_data_for_animation[0][2]
-        tiempo_ultimo_punto_gpx = _all_points_data_for_animation[-1][2]
-        tiempo_para_empezar_a_dibujar = tiempo_primer_punto_gpx + timedelta(seconds=segundos_inicio_dibujo)
-
-        idx_primer_punto_a_dibujar = 0
-        for i, p_data in enumerate(_all_points_data_for_animation):
-            if p_data[2] >= tiempo_para_empezar_a_dibujar:
-                idx_primer_punto_a_dibujar = i
-                break
+        lon, lat, x, y, t_s, ele, tiempo_inicio = track
+        nombre_gpx = os.path.basename(ruta_archivo_gpx)
+        if prefijo_salida is None:
+            prefijo_salida = os.path.splitext(ruta_archivo_gpx)[0]
+
+        idx_primer_punto_a_dibujar = int(np.searchsorted(t_s, segundos_inicio_dibujo, side='left'))
+        if idx_primer_punto_a_dibujar >= len(t_s) and segundos_inicio_dibujo > 0:
+            print("ADVERTENCIA: Todos los puntos están antes del tiempo de inicio de dibujo especificado.")
+        min_x, max_x, min_y, max_y = motor_render.limites_mapa(x, y, idx_primer_punto_a_dibujar)
+        ancho_px = int(round(tamano_figura[0] * dpi))
+        alto_px = int(round(tamano_figura[1] * dpi))
+
+        # --- Muestreo a los frames del proyecto ---
+        duracion_s = float(t_s[-1])
+        num_frames = int(np.floor(duracion_s * fps_proyecto + 1e-9)) + 1
+        frames = np.arange(num_frames)
+        t_frames = frames / fps_proyecto
+
+        if len(t_s) > 1:
+            marcador_x = np.interp(t_frames, t_s, x)
+            marcador_y = np.interp(t_frames, t_s, y)
+            marcador_lon = np.interp(t_frames, t_s, lon)
+            marcador_lat = np.interp(t_frames, t_s, lat)
         else:
-            if segundos_inicio_dibujo > 0 and len(_all_points_data_for_animation) > 0 :
-                 print("ADVERTENCIA: Todos los puntos están antes del tiempo de inicio de dibujo especificado.")
-                 idx_primer_punto_a_dibujar = len(_all_points_data_for_animation)
-            elif len(_all_points_data_for_animation) == 0:
-                 print("No hay puntos para dibujar.")
-                 return False
-
-
-        fig, ax = plt.subplots(figsize=(10, 8))
-        fig.patch.set_alpha(0.0)
-        ax.patch.set_alpha(0.0)
-        fig.subplots_adjust(left=0, right=1, bottom=0, top=1, wspace=0, hspace=0)
-
-
-        puntos_visibles_proyectados_para_limites = _all_points_data_for_animation[idx_primer_punto_a_dibujar:]
-
-        if puntos_visibles_proyectados_para_limites:
-            coords_x_visibles = [p[0] for p in puntos_visibles_proyectados_para_limites]
-            coords_y_visibles = [p[1] for p in puntos_visibles_proyectados_para_limites]
-            min_x, max_x = min(coords_x_visibles), max(coords_x_visibles)
-            min_y, max_y = min(coords_y_visibles), max(coords_y_visibles)
-            margin_x = (max_x - min_x) * 0.05 if max_x != min_x else 100
-            margin_y = (max_y - min_y) * 0.05 if max_y != min_y else 100
-            ax.set_xlim(min_x - margin_x, max_x + margin_x)
-            ax.set_ylim(min_y - margin_y, max_y + margin_y)
-        elif _all_points_data_for_animation:
-            all_x = [p[0] for p in _all_points_data_for_animation]
-            all_y = [p[1] for p in _all_points_data_for_animation]
-            ax.set_xlim(min(all_x) - 100, max(all_x) + 100)
-            ax.set_ylim(min(all_y) - 100, max(all_y) + 100)
+            marcador_x = np.full(num_frames, x[0])
+            marcador_y = np.full(num_frames, y[0])
+            marcador_lon = np.full(num_frames, lon[0])
+            marcador_lat = np.full(num_frames, lat[0])
+
+        x_norm = (marcador_x - min_x) / (max_x - min_x)
+        y_norm = (marcador_y - min_y) / (max_y - min_y)   # Origen abajo a la izquierda, como Fusion
+        px = x_norm * ancho_px
+        py = (1.0 - y_norm) * alto_px                       # Origen arriba a la izquierda, como la imagen
+
+        # Progreso de la ruta dibujada (0-1), útil para el "Write On" de un trazo en Fusion
+        tramo = np.hypot(np.diff(x[idx_primer_punto_a_dibujar:]), np.diff(y[idx_primer_punto_a_dibujar:]))
+        distancia = np.concatenate(([0.0], np.cumsum(tramo)))
+        distancia_total = distancia[-1] if len(distancia) and distancia[-1] > 0 else 0.0
+        if distancia_total > 0:
+            t_dibujo = t_s[idx_primer_punto_a_dibujar:]
+            progreso = np.interp(t_frames, t_dibujo, distancia) / distancia_total
+            progreso[t_frames < t_dibujo[0]] = 0.0
         else:
-            print("No hay datos para establecer límites del mapa.")
-            plt.close(fig)
-            return False
-
-
-        ax.set_axis_off()
-
-        line, = ax.plot([], [], lw=grosor_linea, color='dodgerblue', alpha=0.8, zorder=5)
-        current_point_marker, = ax.plot([], [], 'o', color='red', markersize=tamano_punto, markeredgecolor='white', zorder=6)
-
-        elevation_text = ax.text(0.02, 0.98, '', transform=ax.transAxes, fontsize=10,
-                                 color='black', verticalalignment='top',
-                                 bbox=dict(boxstyle='round,pad=0.3', fc='white', alpha=0.7), zorder=7)
-
-        num_total_frames_animacion = (len(_all_points_data_for_animation) + puntos_gpx_por_frame_anim - 1) // puntos_gpx_por_frame_anim
-
-        if num_total_frames_animacion == 0:
-            print(f"No hay frames para animar en {os.path.basename(ruta_archivo_gpx)}.")
-            plt.close(fig)
-            return False
-
-        intervalo_ms_final_animacion = intervalo_frames_ms_referencia
-        fps_video_final = max(1, 1000 / intervalo_ms_final_animacion)
-
-        if len(_all_points_data_for_animation) > 1:
-            duracion_real_gpx_timedelta = tiempo_ultimo_punto_gpx - tiempo_primer_punto_gpx
-            duracion_real_gpx_s = duracion_real_gpx_timedelta.total_seconds()
-            print(f"Duración real del track GPX ({os.path.basename(ruta_archivo_gpx)}): {duracion_real_gpx_timedelta} ({duracion_real_gpx_s:.2f} segundos).")
-
-            if duracion_real_gpx_s > 0 and num_total_frames_animacion > 0:
-                intervalo_ms_calculado = (duracion_real_gpx_s * 1000.0) / num_total_frames_animacion
-                min_intervalo_ms = 20
-                if intervalo_ms_calculado < min_intervalo_ms:
-                    print(f"ADVERTENCIA (archivo: {os.path.basename(ruta_archivo_gpx)}): Intervalo ({intervalo_ms_calculado:.2f} ms) muy bajo. Usando {min_intervalo_ms} ms.")
-                    intervalo_ms_final_animacion = min_intervalo_ms
-                else:
-                    intervalo_ms_final_animacion = intervalo_ms_calculado
-                fps_video_final = 1000.0 / intervalo_ms_final_animacion
-                print(f"Para sincronizar ({os.path.basename(ruta_archivo_gpx)}): {num_total_frames_animacion} frames, intervalo: {intervalo_ms_final_animacion:.2f} ms, FPS: {fps_video_final:.2f}.")
-            elif duracion_real_gpx_s <= 0:
-                 print(f"Duración GPX cero o negativa ({os.path.basename(ruta_archivo_gpx)}). Usando intervalo de referencia.")
-        elif len(_all_points_data_for_animation) == 1:
-             print(f"Solo 1 punto en GPX ({os.path.basename(ruta_archivo_gpx)}). Usando intervalo de referencia.")
-
-        def init_animation_batch():
-            global _local_ultima_elevacion_mostrada_texto
-            line.set_data([], [])
-            current_point_marker.set_data([],[])
-            elevation_text.set_text('')
-            _local_ultima_elevacion_mostrada_texto[0] = None
-            return line, current_point_marker, elevation_text
-
-        def update_animation_batch(frame_idx_anim):
-            global _local_ultima_elevacion_mostrada_texto
-            idx_ultimo_gpx_a_considerar = min( (frame_idx_anim + 1) * puntos_gpx_por_frame_anim -1 , len(_all_points_data_for_animation) - 1)
-
-            punto_gpx_actual_data = _all_points_data_for_animation[idx_ultimo_gpx_a_considerar]
-            tiempo_punto_gpx_actual = punto_gpx_actual_data[2]
-            x_actual_marcador = punto_gpx_actual_data[0]
-            y_actual_marcador = punto_gpx_actual_data[1]
-
-            idx_inicio_ventana = max(0, idx_ultimo_gpx_a_considerar - ventana_promedio_altura_puntos + 1)
-            elevaciones_ventana = []
-            for i in range(idx_inicio_ventana, idx_ultimo_gpx_a_considerar + 1):
-                ele = _all_points_data_for_animation[i][3]
-                if ele is not None:
-                    elevaciones_ventana.append(ele)
-
-            elevacion_suavizada_actual = None
-            if elevaciones_ventana:
-                elevacion_suavizada_actual = np.mean(elevaciones_ventana)
-
-            actualizar_texto_altura = False
-            if elevacion_suavizada_actual is not None:
-                if _local_ultima_elevacion_mostrada_texto[0] is None or \
-                   abs(elevacion_suavizada_actual - _local_ultima_elevacion_mostrada_texto[0]) >= umbral_actualizacion_altura_m:
-                    actualizar_texto_altura = True
-            elif _local_ultima_elevacion_mostrada_texto[0] is not None:
-                 actualizar_texto_altura = True
-
-            if actualizar_texto_altura:
-                if elevacion_suavizada_actual is not None:
-                    elevation_text.set_text(f'Altura: {elevacion_suavizada_actual:.1f} m')
-                    _local_ultima_elevacion_mostrada_texto[0] = elevacion_suavizada_actual
-                else:
-                    elevation_text.set_text('Altura: N/A')
-                    _local_ultima_elevacion_mostrada_texto[0] = None
-
-            if tiempo_punto_gpx_actual >= tiempo_para_empezar_a_dibujar:
-                puntos_linea_x = []
-                puntos_linea_y = []
-                for i in range(idx_primer_punto_a_dibujar, idx_ultimo_gpx_a_considerar + 1):
-                    puntos_linea_x.append(_all_points_data_for_animation[i][0])
-                    puntos_linea_y.append(_all_points_data_for_animation[i][1])
-                line.set_data(puntos_linea_x, puntos_linea_y)
-                current_point_marker.set_data([x_actual_marcador], [y_actual_marcador])
-                current_point_marker.set_alpha(1)
-            else:
-                line.set_data([], [])
-                current_point_marker.set_data([x_actual_marcador], [y_actual_marcador])
-                current_point_marker.set_alpha(0.3)
-
-            if num_total_frames_animacion > 0 and frame_idx_anim % max(1, (num_total_frames_animacion // 20)) == 0 :
-                 print(f"  Procesando frame ({os.path.basename(ruta_archivo_gpx)}): {frame_idx_anim+1}/{num_total_frames_animacion}")
-
-            return line, current_point_marker, elevation_text
-
-        print(f"Creando animación para {os.path.basename(ruta_archivo_gpx)} con {num_total_frames_animacion} frames totales...")
-        ani = animation.FuncAnimation(fig, update_animation_batch, frames=num_total_frames_animacion,
-                                      init_func=init_animation_batch, blit=True,
-                                      interval=intervalo_ms_final_animacion,
-                                      repeat=False)
+            progreso = (t_frames >= segundos_inicio_dibujo).astype(float)
+
+        # Altura: mismos frames de animación que el vídeo; cada frame del proyecto
+        # toma el último frame de animación cuyo punto GPX ya ha pasado. Las
+        # listas llevan delante una entrada vacía para los frames anteriores al
+        # primero, así que frame_anim es el índice del frame de animación + 1.
+        idx_frame_anim = motor_render.indices_frames_animacion(len(t_s), puntos_gpx_por_frame_anim)
+        mostrada_anim, textos_anim = motor_render.altura_por_frame(
+            ele, idx_frame_anim, ventana_promedio_altura_puntos, umbral_actualizacion_altura_m)
+        frame_anim = np.searchsorted(t_s[idx_frame_anim], t_frames, side='right')
+        textos_anim = [''] + textos_anim
+        celdas_altura = [''] + ['' if a != a else f'{a:.1f}' for a in mostrada_anim.tolist()]
+
+        # --- CSV por frame ---
+        # Con ~100k frames por hora la conversión de floats domina el tiempo
+        # total, así que se formatean bloques enteros con un solo "%" en lugar
+        # de usar csv.writer, y el timecode y la altura salen de textos cacheados.
+        # El timecode es non-drop-frame sobre el FPS nominal, igual que lo numera Resolve
+        fps_nominal = max(1, int(round(fps_proyecto)))
+        segundos_tc = [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}:"
+                       for s in range(num_frames // fps_nominal + 1)]
+        frames_tc = [f"{ff:02d}" for ff in range(fps_nominal)]
+        timecodes = [segundos_tc[s] + frames_tc[ff] for s, ff in
+                     zip((frames // fps_nominal).tolist(), (frames % fps_nominal).tolist())]
+        columnas = zip(frames.tolist(), timecodes, t_frames.tolist(),
+                       _tiempos_iso_utc(tiempo_inicio, t_frames),
+                       marcador_lon.tolist(), marcador_lat.tolist(),
+                       px.tolist(), py.tolist(), x_norm.tolist(), y_norm.tolist(),
+                       progreso.tolist(), [celdas_altura[i] for i in frame_anim.tolist()])
+        formato_linea = "%d,%s,%.4f,%s,%.7f,%.7f,%.2f,%.2f,%.6f,%.6f,%.6f,%s\n"
+
+        ruta_csv = f"{prefijo_salida}-nle-frames.csv"
+        with open(ruta_csv, 'w', newline='', encoding='utf-8') as f_csv:
+            f_csv.write("frame,timecode,time_s,gpx_time,lon,lat,marker_px,marker_py,"
+                        "marker_x_norm,marker_y_norm,route_progress,elevation_m\n")
+            while True:
+                bloque = [v for fila in itertools.islice(columnas, 4096) for v in fila]
+                if not bloque:
+                    break
+                f_csv.write((formato_linea * (len(bloque) // 12)) % tuple(bloque))
+        print(f"  CSV por frame ({num_frames} frames a {fps_proyecto} FPS): {ruta_csv}")
+
+        # --- Subtítulos de altura: un cue por cada cambio de texto ---
+        id_texto = np.cumsum([0] + [a != b for a, b in zip(textos_anim[1:], textos_anim[:-1])])
+        grupo = id_texto[frame_anim]
+        inicios_cue = np.concatenate(([0], np.flatnonzero(grupo[1:] != grupo[:-1]) + 1))
+        fines_cue = np.concatenate((inicios_cue[1:], [num_frames]))
+        cues = []
+        for inicio, fin in zip(inicios_cue.tolist(), fines_cue.tolist()):
+            texto = textos_anim[frame_anim[inicio]]
+            if texto:  # Sin cue antes de la primera altura, igual que el vídeo
+                cues.append((inicio / fps_proyecto, fin / fps_proyecto, texto))
+
+        ruta_srt = f"{prefijo_salida}-nle-altura.srt"
+        with open(ruta_srt, 'w', encoding='utf-8') as f_srt:
+            for n, (inicio, fin, texto) in enumerate(cues, start=1):
+                f_srt.write(f"{n}\n{_formato_tiempo_subtitulo(inicio, ',')} --> {_formato_tiempo_subtitulo(fin, ',')}\n{texto}\n\n")
+        ruta_vtt = f"{prefijo_salida}-nle-altura.vtt"
+        with open(ruta_vtt, 'w', encoding='utf-8') as f_vtt:
+            f_vtt.write("WEBVTT\n\n")
+            for inicio, fin, texto in cues:
+                f_vtt.write(f"{_formato_tiempo_subtitulo(inicio, '.')} --> {_formato_tiempo_subtitulo(fin, '.')}\n{texto}\n\n")
+        print(f"  Subtítulos de altura ({len(cues)} cambios): {ruta_srt}, {ruta_vtt}")
+
+        # --- Ruta estática ---
+        fig, ax = plt.subplots(figsize=tamano_figura)
         try:
-            print(f"Guardando animación en {archivo_salida_video} con {fps_video_final:.2f} FPS...")
-
-            ani.save(
-                archivo_salida_video,
-                fps=fps_video_final,
-                savefig_kwargs={
-                    'transparent': True,
-                    'facecolor': 'none',
-                },
-                progress_callback=lambda cf, tf: print(f"  Guardando frame ({os.path.basename(ruta_archivo_gpx)}) {cf+1}/{tf}...") if tf > 0 and cf % max(1, (tf // 10)) == 0 else None
-            )
-            print(f"¡Animación guardada exitosamente en {archivo_salida_video}!")
-            if num_total_frames_animacion > 0 and fps_video_final > 0:
-                duracion_video_esperada_s = num_total_frames_animacion / fps_video_final
-                print(f"Duración esperada del video ({os.path.basename(ruta_archivo_gpx)}): {duracion_video_esperada_s:.2f} segundos.")
-            return True
-        except Exception as e:
-            print(f"Error guardando la animación para {os.path.basename(ruta_archivo_gpx)}: {e}")
+            fig.subplots_adjust(left=0, right=1, bottom=0, top=1, wspace=0, hspace=0)
+            fig.patch.set_alpha(0.0)
+            ax.patch.set_alpha(0.0)
+            ax.set_xlim(min_x, max_x)
+            ax.set_ylim(min_y, max_y)
+            ax.set_axis_off()
+            ax.plot(x[idx_primer_punto_a_dibujar:], y[idx_primer_punto_a_dibujar:],
+                    lw=grosor_linea, color='dodgerblue', alpha=0.8, zorder=5)
+            ruta_png = f"{prefijo_salida}-nle-ruta.png"
+            fig.savefig(ruta_png, dpi=dpi, transparent=True, facecolor='none')
         finally:
             plt.close(fig)
+        print(f"  Ruta estática ({ancho_px}x{alto_px}): {ruta_png}")
+
+        print(f"¡Exportación de datos completada para {nombre_gpx}!")
+        return True
 
     except FileNotFoundError:
         print(f"Error: No se encontró el archivo GPX en la ruta: {ruta_archivo_gpx}")
     except Exception as e:
-        print(f"Ocurrió un error general procesando {ruta_archivo_gpx}: {e}")
+        print(f"Ocurrió un error general exportando {ruta_archivo_gpx}: {e}")
         import traceback
         traceback.print_exc()
 
@@ -243,45 +227,61 @@ def animar_ruta_gpx_sincronizada(ruta_archivo_gpx,
 def procesar_directorio_gpx(directorio_raiz,
                             intervalo_ref, puntos_frame, seg_inicio, # map_src ya no es tan relevante aquí
                             ventana_altura, umbral_altura,
-                            grosor_linea_lote, tamano_punto_lote
+                            grosor_linea_lote, tamano_punto_lote,
+                            modo_exportacion="video", # "video" (MP4 transparente) o "datos" (CSV/SRT/VTT/PNG)
+                            fps_proyecto=29.97
                             ):
     archivos_gpx_encontrados = 0
     archivos_procesados_ok = 0
     archivos_con_fallo = 0
 
     print(f"Iniciando escaneo de GPX en el directorio: {directorio_raiz}")
-    for dirpath, dirnames, filenames in os.walk(directorio_raiz):
-        for filename in filenames:
-            if filename.lower().endswith(".gpx"):
-                archivos_gpx_encontrados += 1
-                ruta_completa_gpx = os.path.join(dirpath, filename)
-
-                nombre_base_gpx = os.path.splitext(filename)[0]
-                nombre_video_salida = f"{nombre_base_gpx}-telemetry-no_map.mp4" # Sufijo para indicar que no tiene mapa
-                ruta_completa_video = os.path.join(dirpath, nombre_video_salida)
-
-                print("\n====================================================================")
-                print(f"==> Procesando archivo GPX: {ruta_completa_gpx}")
-                print(f"    Video de salida (sin mapa): {ruta_completa_video}")
-                print("====================================================================")
-
-                if animar_ruta_gpx_sincronizada(
-                        ruta_archivo_gpx=ruta_completa_gpx,
-                        archivo_salida_video=ruta_completa_video,
-                        intervalo_frames_ms_referencia=intervalo_ref,
-                        puntos_gpx_por_frame_anim=puntos_frame,
-                        segundos_inicio_dibujo=seg_inicio,
-                        map_source=None, # Explicitamente None
-                        ventana_promedio_altura_puntos=ventana_altura,
-                        umbral_actualizacion_altura_m=umbral_altura,
-                        grosor_linea=grosor_linea_lote,
-                        tamano_punto=tamano_punto_lote
-                    ):
-                    archivos_procesados_ok +=1
-                else:
-                    archivos_con_fallo +=1
-
-                print("--------------------------------------------------------------------\n")
+    catalogo = media_catalog.update_catalog(directorio_raiz)
+    for ruta_completa_gpx in media_catalog.files_of_kind(catalogo, "gpx"):
+        archivos_gpx_encontrados += 1
+        dirpath, filename = os.path.split(ruta_completa_gpx)
+
+        nombre_base_gpx = os.path.splitext(filename)[0]
+        nombre_video_salida = f"{nombre_base_gpx}-telemetry-no_map.mp4" # Sufijo para indicar que no tiene mapa
+        ruta_completa_video = os.path.join(dirpath, nombre_video_salida)
+
+        print("\n====================================================================")
+        print(f"==> Procesando archivo GPX: {ruta_completa_gpx}")
+        if modo_exportacion == "datos":
+            print(f"    Datos de salida: {os.path.join(dirpath, nombre_base_gpx)}-nle-*")
+        else:
+            print(f"    Video de salida (sin mapa): {ruta_completa_video}")
+        print("====================================================================")
+
+        if modo_exportacion == "datos":
+            exito = exportar_telemetria_nle(
+                ruta_archivo_gpx=ruta_completa_gpx,
+                fps_proyecto=fps_proyecto,
+                puntos_gpx_por_frame_anim=puntos_frame,
+                segundos_inicio_dibujo=seg_inicio,
+                ventana_promedio_altura_puntos=ventana_altura,
+                umbral_actualizacion_altura_m=umbral_altura,
+                grosor_linea=grosor_linea_lote
+            )
+        else:
+            exito = animar_ruta_gpx_sincronizada(
+                    ruta_archivo_gpx=ruta_completa_gpx,
+                    archivo_salida_video=ruta_completa_video,
+                    intervalo_frames_ms_referencia=intervalo_ref,
+                    puntos_gpx_por_frame_anim=puntos_frame,
+                    segundos_inicio_dibujo=seg_inicio,
+                    map_source=None, # Explicitamente None
+                    ventana_promedio_altura_puntos=ventana_altura,
+                    umbral_actualizacion_altura_m=umbral_altura,
+                    grosor_linea=grosor_linea_lote,
+                    tamano_punto=tamano_punto_lote
+            )
+        if exito:
+            archivos_procesados_ok +=1
+        else:
+            archivos_con_fallo +=1
+
+        print("--------------------------------------------------------------------\n")
 
 
     print("\n======= RESUMEN DEL PROCESAMIENTO POR LOTES =======")
@@ -305,6 +305,11 @@ if __name__ == "__main__":
     grosor_linea_principal_lote = 8
     tamano_punto_actual_lote = 14
 
+    # "video": MP4 transparente. "datos": CSV por frame + subtítulos + PNG de la ruta,
+    # para animar la telemetría directamente en Resolve/Fusion sin renderizar vídeo.
+    modo_exportacion_lote = "video"
+    fps_proyecto_lote = 29.97
+
     if not os.path.isdir(directorio_raiz_a_procesar):
         print(f"Error: El directorio especificado '{directorio_raiz_a_procesar}' no existe o no es un directorio.")
         print("Por favor, verifica la ruta en la variable 'directorio_raiz_a_procesar' dentro del script.")
@@ -317,5 +322,7 @@ if __name__ == "__main__":
             ventana_altura=ventana_puntos_altura_lote,
             umbral_altura=umbral_cambio_altura_lote,
             grosor_linea_lote=grosor_linea_principal_lote,
-            tamano_punto_lote=tamano_punto_actual_lote
+            tamano_punto_lote=tamano_punto_actual_lote,
+            modo_exportacion=modo_exportacion_lote,
+            fps_proyecto=fps_proyecto_lote
         )
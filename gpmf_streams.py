@@ -0,0 +1,310 @@
+# Filename: gpmf_streams.py
+import os
+import csv
+import struct
+
+# Streams extracted when none are given explicitly
+DEFAULT_STREAMS = ("GPS5", "GPS9", "ACCL", "GYRO", "CORI")
+
+# Column names of each stream's samples (before the time column is added)
+STREAM_COLUMNS = {
+    "GPS5": ["latitude", "longitude", "altitude", "speed_2d", "speed_3d"],
+    "GPS9": ["latitude", "longitude", "altitude", "speed_2d", "speed_3d",
+             "days_since_2000", "seconds_since_midnight", "dop", "fix"],
+    "ACCL": ["x", "y", "z"],
+    "GYRO": ["x", "y", "z"],
+    "CORI": ["w", "x", "y", "z"],
+}
+
+# Per-payload metadata that is copied onto every sample of the stream
+STICKY_COLUMNS = {
+    "GPS5": {"GPSF": "fix", "GPSP": "dop"},
+}
+
+# GPMF type character -> struct format (big endian)
+GPMF_TYPES = {
+    "b": "b", "B": "B", "c": "c", "d": "d", "f": "f", "F": "4s", "G": "16s",
+    "j": "q", "J": "Q", "l": "i", "L": "I", "q": "i", "Q": "q", "s": "h",
+    "S": "H", "U": "16s",
+}
+
+
+class GPMFError(Exception):
+    """The file has no usable GPMF track."""
+
+
+# --- MP4 sample table -------------------------------------------------------
+
+def _iter_boxes(buf, start, end):
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            break
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _find_box(buf, start, end, path):
+    for box_type, payload_start, payload_end in _iter_boxes(buf, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload_start, payload_end
+            return _find_box(buf, payload_start, payload_end, path[1:])
+    return None
+
+
+def _read_moov(f):
+    """Reads the moov box without touching mdat (only box headers are read)."""
+    file_size = os.fstat(f.fileno()).st_size
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        size, box_type = struct.unpack_from(">I4s", header)
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+        elif size == 0:
+            size = file_size - pos
+        if size < 8:
+            break
+        if box_type == b"moov":
+            f.seek(pos)
+            return f.read(size)
+        pos += size
+    raise GPMFError("no moov box")
+
+
+def _gpmf_sample_table(moov):
+    """
+    Returns [(offset, size, start_s, duration_s), ...] for every sample of the
+    GPMF ('gpmd') track, built from stsz/stco/co64/stsc/stts.
+    """
+    for box_type, trak_start, trak_end in _iter_boxes(moov, 8, len(moov)):
+        if box_type != b"trak":
+            continue
+        stbl = _find_box(moov, trak_start, trak_end, [b"mdia", b"minf", b"stbl"])
+        stsd = stbl and _find_box(moov, stbl[0], stbl[1], [b"stsd"])
+        if not stsd or moov[stsd[0] + 12:stsd[0] + 16] != b"gpmd":
+            continue
+
+        mdhd = _find_box(moov, trak_start, trak_end, [b"mdia", b"mdhd"])
+        version = moov[mdhd[0]]
+        timescale = struct.unpack_from(">I", moov, mdhd[0] + (20 if version == 1 else 12))[0]
+
+        start, _ = _find_box(moov, stbl[0], stbl[1], [b"stsz"])
+        sample_size, count = struct.unpack_from(">II", moov, start + 4)
+        if sample_size:
+            sizes = [sample_size] * count
+        else:
+            sizes = list(struct.unpack_from(f">{count}I", moov, start + 12))
+
+        chunk_box = _find_box(moov, stbl[0], stbl[1], [b"stco"])
+        if chunk_box:
+            n = struct.unpack_from(">I", moov, chunk_box[0] + 4)[0]
+            chunk_offsets = struct.unpack_from(f">{n}I", moov, chunk_box[0] + 8)
+        else:
+            chunk_box = _find_box(moov, stbl[0], stbl[1], [b"co64"])
+            n = struct.unpack_from(">I", moov, chunk_box[0] + 4)[0]
+            chunk_offsets = struct.unpack_from(f">{n}Q", moov, chunk_box[0] + 8)
+
+        start, _ = _find_box(moov, stbl[0], stbl[1], [b"stsc"])
+        n = struct.unpack_from(">I", moov, start + 4)[0]
+        stsc = [struct.unpack_from(">III", moov, start + 8 + 12 * i)[:2] for i in range(n)]
+
+        start, _ = _find_box(moov, stbl[0], stbl[1], [b"stts"])
+        n = struct.unpack_from(">I", moov, start + 4)[0]
+        durations = []
+        for i in range(n):
+            run, delta = struct.unpack_from(">II", moov, start + 8 + 8 * i)
+            durations.extend([delta] * run)
+
+        offsets = []
+        for i, (first_chunk, per_chunk) in enumerate(stsc):
+            last_chunk = stsc[i + 1][0] - 1 if i + 1 < len(stsc) else len(chunk_offsets)
+            for chunk in range(first_chunk - 1, last_chunk):
+                pos = chunk_offsets[chunk]
+                for _ in range(per_chunk):
+                    if len(offsets) == len(sizes):
+                        break
+                    offsets.append(pos)
+                    pos += sizes[len(offsets) - 1]
+
+        table = []
+        t = 0
+        for offset, size, duration in zip(offsets, sizes, durations):
+            table.append((offset, size, t / timescale, duration / timescale))
+            t += duration
+        return table
+
+    raise GPMFError("no GPMF (gpmd) track")
+
+
+# --- GPMF payloads ----------------------------------------------------------
+
+def _iter_klv(buf, start, end):
+    """Yields (key, type_char, struct_size, repeat, data_start, data_end)."""
+    pos = start
+    while pos + 8 <= end:
+        key = buf[pos:pos + 4]
+        type_char = chr(buf[pos + 4])
+        struct_size = buf[pos + 5]
+        repeat = struct.unpack_from(">H", buf, pos + 6)[0]
+        data_start = pos + 8
+        data_end = data_start + struct_size * repeat
+        if data_end > end:
+            break
+        if key != b"\0\0\0\0":
+            yield key.decode("latin-1"), type_char, struct_size, repeat, data_start, data_end
+        pos = data_start + ((struct_size * repeat + 3) & ~3)
+
+
+def _struct_format(type_char, struct_size, complex_type):
+    if type_char == "?":
+        if not complex_type:
+            return None
+        element = "".join(GPMF_TYPES.get(c, "") for c in complex_type)
+    else:
+        element = GPMF_TYPES.get(type_char)
+        if element is None:
+            return None
+        count = struct_size // struct.calcsize(f">{element}")
+        element = element * max(count, 1)
+    fmt = f">{element}"
+    return fmt if struct.calcsize(fmt) == struct_size else None
+
+
+def _decode(buf, klv, complex_type=None):
+    _, type_char, struct_size, _, data_start, data_end = klv
+    fmt = _struct_format(type_char, struct_size, complex_type)
+    if fmt is None:
+        return None
+    values = list(struct.iter_unpack(fmt, buf[data_start:data_end]))
+    if type_char == "q":
+        values = [tuple(v / 65536.0 for v in row) for row in values]
+    elif type_char == "Q":
+        values = [tuple(v / 4294967296.0 for v in row) for row in values]
+    return values
+
+
+def _text(buf, klv):
+    return buf[klv[4]:klv[5]].decode("latin-1").rstrip("\0")
+
+
+def _scaled(samples, scale):
+    if not scale:
+        return samples
+    if len(scale) == 1:
+        s = scale[0] or 1
+        return [tuple(v / s for v in row) for row in samples]
+    return [tuple(v / (s or 1) if isinstance(v, (int, float)) else v for v, s in zip(row, scale))
+            for row in samples]
+
+
+def _parse_payload(payload, wanted, start_s, duration_s, rows, columns):
+    """
+    Appends (time_s, values..., sticky values...) rows for every wanted stream
+    found in one GPMF payload. Column names are recorded in `columns` the
+    first time a stream is seen.
+    """
+    for devc in _iter_klv(payload, 0, len(payload)):
+        if devc[0] != "DEVC" or devc[1] != "\0":
+            continue
+        for strm in _iter_klv(payload, devc[4], devc[5]):
+            if strm[0] != "STRM" or strm[1] != "\0":
+                continue
+            # Metadata keys (SCAL, TYPE, ORIN, GPSF...) precede the data key they describe
+            sticky = {}
+            for klv in _iter_klv(payload, strm[4], strm[5]):
+                stream = klv[0]
+                if stream not in wanted:
+                    sticky[stream] = klv
+                    continue
+
+                complex_type = _text(payload, sticky["TYPE"]) if "TYPE" in sticky else None
+                samples = _decode(payload, klv, complex_type)
+                if not samples:
+                    continue
+                if "SCAL" in sticky:
+                    scale = [v for row in _decode(payload, sticky["SCAL"]) or [] for v in row]
+                    samples = _scaled(samples, scale)
+
+                extras = ()
+                for extra_key in STICKY_COLUMNS.get(stream, {}):
+                    value = None
+                    if extra_key in sticky:
+                        decoded = _decode(payload, sticky[extra_key])
+                        value = decoded[0][0] if decoded else None
+                        if extra_key == "GPSP" and value is not None:
+                            value = value / 100.0
+                    extras += (value,)
+
+                if stream not in columns:
+                    orientation = _text(payload, sticky["ORIN"]).lower() if "ORIN" in sticky else ""
+                    columns[stream] = _column_names(stream, len(samples[0]), orientation)
+
+                stream_rows = rows[stream]
+                step = duration_s / len(samples)
+                for j, row in enumerate(samples):
+                    stream_rows.append((round(start_s + j * step, 6),) + row + extras)
+
+
+def _column_names(stream, width, orientation=""):
+    """
+    Sample column names. IMU axes follow the stream's ORIN key when present,
+    since the sensor axis order differs between camera models.
+    """
+    if stream in ("ACCL", "GYRO") and len(orientation) == width:
+        names = list(orientation)
+    else:
+        names = list(STREAM_COLUMNS.get(stream, []))
+    names += [f"v{i}" for i in range(len(names), width)]
+    names = names[:width]
+    return names + list(STICKY_COLUMNS.get(stream, {}).values())
+
+
+def extract_streams(mp4_filepath, streams=DEFAULT_STREAMS, output_prefix=None):
+    """
+    Demuxes the selected GPMF streams of a GoPro clip in a single pass and
+    writes each one to <output_prefix>_<STREAM>.csv (time_s plus one column
+    per value).
+
+    Only the moov box and the GPMF samples are read, in file order, so asking
+    for five streams costs the same I/O as asking for one. Timestamps come
+    from the MP4 sample table: each payload's samples are spread evenly over
+    the payload's duration.
+
+    Returns a dict {stream: csv_path} for the streams found in the file.
+    Raises GPMFError if the clip has no GPMF track.
+    """
+    wanted = set(streams)
+    if output_prefix is None:
+        output_prefix = os.path.splitext(mp4_filepath)[0]
+    rows = {stream: [] for stream in wanted}
+    columns = {}
+
+    with open(mp4_filepath, "rb") as f:
+        table = _gpmf_sample_table(_read_moov(f))
+        for offset, size, start_s, duration_s in sorted(table):
+            f.seek(offset)
+            payload = f.read(size)
+            if len(payload) == size:
+                _parse_payload(payload, wanted, start_s, duration_s, rows, columns)
+
+    outputs = {}
+    for stream in streams:
+        if not rows[stream]:
+            continue
+        output_path = f"{output_prefix}_{stream}.csv"
+        with open(output_path, "w", newline="", encoding="utf-8") as f_csv:
+            writer = csv.writer(f_csv)
+            writer.writerow(["time_s"] + columns[stream])
+            writer.writerows(rows[stream])
+        outputs[stream] = output_path
+    return outputs
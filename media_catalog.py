@@ -0,0 +1,300 @@
+# Filename: media_catalog.py
+import os
+import json
+import time
+import hashlib
+
+import gpmf_streams
+
+CATALOG_VERSION = 3
+
+# Catalogs live outside the scanned tree: writing one inside it would change
+# the root directory's mtime and force a rescan of the root on every run.
+CATALOG_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gpmf_catalog")
+
+# Suffixes used by the render scripts for their output videos
+OVERLAY_SUFFIXES = ("-gps", "-telemetry-no_map")
+
+# Data exports for the NLE (<gpx stem>-nle-frames.csv, -nle-altura.srt, ...)
+# count as rendered overlays: they replace the overlay video in the edit.
+NLE_EXPORT_MARKER = "-nle-"
+NLE_EXPORT_EXTENSIONS = (".csv", ".srt", ".vtt", ".png")
+
+# Directories whose mtime is this close to the scan time are rescanned on the
+# next run: on exFAT/HFS+ (typical for external drives) the mtime resolution
+# is coarse enough that a file created right after the scan could otherwise
+# leave the directory mtime unchanged.
+MTIME_SAFETY_WINDOW_S = 2.0
+
+
+def _classify(filename):
+    """
+    Returns (kind, clip_key) for a filename, or (None, None) if the file is
+    not something this project reads or produces.
+    """
+    stem, ext = os.path.splitext(filename)
+    ext = ext.lower()
+
+    if ext == ".mp4":
+        # Overlays are told apart from clips per directory (see _mark_overlays)
+        return "clip", stem
+    if ext in NLE_EXPORT_EXTENSIONS and NLE_EXPORT_MARKER in stem:
+        return "overlay", stem.rsplit(NLE_EXPORT_MARKER, 1)[0]
+    if ext == ".gpx":
+        return "gpx", stem
+    if ext == ".csv":
+        base, _, stream = stem.rpartition("_")
+        if base and stream in gpmf_streams.STREAM_COLUMNS:  # <clip stem>_<STREAM>.csv
+            return "stream", base
+        return "csv", stem
+    if ext in (".thm", ".lrv"):
+        # GoPro low-res proxies are named GL010001.LRV for GH010001.MP4/GX010001.MP4
+        if ext == ".lrv" and stem[:2].upper() == "GL":
+            return "sidecar", stem[2:]
+        return "sidecar", stem
+    return None, None
+
+
+def _overlay_keys(stem):
+    """
+    GPX stems a rendered video name could come from: <gpx stem><suffix> or,
+    for render presets that append their own tag, <gpx stem><suffix>-<tag>.
+    """
+    keys = []
+    for suffix in OVERLAY_SUFFIXES:
+        pos = stem.find(suffix)
+        while pos > 0:
+            rest = stem[pos + len(suffix):]
+            if rest == "" or (rest.startswith("-") and len(rest) > 1):
+                keys.append(stem[:pos])
+            pos = stem.find(suffix, pos + 1)
+    return keys
+
+
+def _mark_overlays(files):
+    """
+    Reclassifies as overlays the .MP4 files named after a GPX of the same
+    directory, so a clip such as my-gps-ride.MP4 stays a clip unless
+    my.gpx sits next to it.
+    """
+    gpx_stems = {info["key"] for info in files.values() if info["kind"] == "gpx"}
+    for info in files.values():
+        if info["kind"] != "clip":
+            continue
+        for key in _overlay_keys(info["key"]):
+            if key in gpx_stems:
+                info["kind"] = "overlay"
+                info["key"] = key
+                break
+
+
+def _clip_key(kind, stem):
+    if kind == "clip" and stem[:2].upper() in ("GH", "GX"):
+        return stem[2:]
+    return stem
+
+
+def _build_links(files):
+    """
+    Groups the files of one directory around the clip they come from.
+    Outputs are always written next to their source, so links never cross
+    directories.
+    """
+    clips_by_key = {}
+    for name, info in files.items():
+        if info["kind"] == "clip":
+            stem = os.path.splitext(name)[0]
+            clips_by_key[stem] = name
+            clips_by_key.setdefault(_clip_key("clip", stem), name)
+
+    links = {}
+    for name, info in files.items():
+        if info["kind"] == "clip":
+            links.setdefault(name, {"gpx": None, "csv": None, "streams": [], "overlays": [], "sidecars": []})
+            continue
+        clip_name = clips_by_key.get(info["key"])
+        if clip_name is None:
+            continue
+        entry = links.setdefault(clip_name, {"gpx": None, "csv": None, "streams": [], "overlays": [], "sidecars": []})
+        if info["kind"] in ("gpx", "csv"):
+            entry[info["kind"]] = name
+        else:
+            entry[info["kind"] + "s"].append(name)
+
+    for entry in links.values():
+        entry["streams"].sort()
+        entry["overlays"].sort()
+        entry["sidecars"].sort()
+    return links
+
+
+def _scan_directory(path, dir_mtime_ns):
+    subdirs = []
+    files = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    continue
+                kind, key = _classify(entry.name)
+                if kind is None:
+                    continue
+                st = entry.stat()
+            except OSError:
+                # Vanished between listing and stat (e.g. a card offload in progress)
+                continue
+            files[entry.name] = {
+                "kind": kind,
+                "key": key,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+            }
+
+    _mark_overlays(files)
+    subdirs.sort()
+    unstable = (time.time_ns() - dir_mtime_ns) < MTIME_SAFETY_WINDOW_S * 1e9
+    return {
+        "mtime_ns": dir_mtime_ns,
+        "unstable": unstable,
+        "subdirs": subdirs,
+        "files": files,
+        "links": _build_links(files),
+    }
+
+
+def default_catalog_path(root_folder):
+    digest = hashlib.sha1(os.path.abspath(root_folder).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CATALOG_DIR, f"{digest}.json")
+
+
+def load_catalog(root_folder, catalog_path=None):
+    """
+    Loads the catalog saved for root_folder. Returns an empty catalog if there
+    is none or it can't be used (other root, older version, corrupt file).
+    """
+    root_folder = os.path.abspath(root_folder)
+    catalog_path = catalog_path or default_catalog_path(root_folder)
+    empty = {"version": CATALOG_VERSION, "root": root_folder, "directories": {}}
+    try:
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except FileNotFoundError:
+        return empty
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not read catalog '{catalog_path}' ({e}). Rebuilding it.")
+        return empty
+
+    if catalog.get("version") != CATALOG_VERSION or catalog.get("root") != root_folder:
+        return empty
+    return catalog
+
+
+def save_catalog(catalog, catalog_path=None):
+    catalog_path = catalog_path or default_catalog_path(catalog["root"])
+    tmp_path = f"{catalog_path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(catalog_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f)
+        os.replace(tmp_path, catalog_path)
+    except OSError as e:
+        # The current run still gets a usable in-memory catalog
+        print(f"WARNING: Could not save catalog to '{catalog_path}': {e}")
+
+
+def update_catalog(root_folder, catalog_path=None, save=True, verbose=True):
+    """
+    Refreshes the catalog of root_folder and returns it.
+
+    Only directories whose mtime changed since the last run are listed again;
+    the rest cost a single stat() each. Files rewritten in place (same name)
+    don't change their directory's mtime, so their size/mtime in the catalog
+    can be stale, but their presence and links are always current.
+    """
+    root_folder = os.path.abspath(root_folder)
+    catalog = load_catalog(root_folder, catalog_path)
+    previous = catalog["directories"]
+    directories = {}
+    scanned = 0
+    reused = 0
+
+    pending = [""]
+    while pending:
+        rel_path = pending.pop()
+        abs_path = os.path.join(root_folder, rel_path)
+        try:
+            st = os.stat(abs_path)
+            cached = previous.get(rel_path)
+            if cached and not cached.get("unstable") and cached["mtime_ns"] == st.st_mtime_ns:
+                entry = cached
+                reused += 1
+            else:
+                entry = _scan_directory(abs_path, st.st_mtime_ns)
+                scanned += 1
+        except OSError as e:
+            print(f"WARNING: Could not read directory {abs_path}: {e}")
+            continue
+        directories[rel_path] = entry
+        pending.extend(os.path.join(rel_path, d) for d in reversed(entry["subdirs"]))
+
+    catalog = {"version": CATALOG_VERSION, "root": root_folder, "directories": directories}
+    if verbose:
+        print(f"Catalog for {root_folder}: {scanned} directories scanned, {reused} unchanged.")
+    if save:
+        save_catalog(catalog, catalog_path)
+    return catalog
+
+
+def iter_files(catalog, kind=None):
+    """
+    Yields (path, info) for every cataloged file, optionally only those of one
+    kind ("clip", "gpx", "csv", "stream", "overlay" or "sidecar"), in path order.
+    """
+    root = catalog["root"]
+    for rel_dir in sorted(catalog["directories"]):
+        files = catalog["directories"][rel_dir]["files"]
+        for name in sorted(files):
+            info = files[name]
+            if kind is None or info["kind"] == kind:
+                yield os.path.join(root, rel_dir, name), info
+
+
+def files_of_kind(catalog, kind):
+    return [path for path, _ in iter_files(catalog, kind)]
+
+
+def derived_files(catalog, clip_path):
+    """
+    Returns the outputs linked to a clip as absolute paths:
+    {"gpx": path|None, "csv": path|None, "streams": [...], "overlays": [...],
+    "sidecars": [...]}.
+    """
+    rel_dir, name = os.path.split(os.path.relpath(os.path.abspath(clip_path), catalog["root"]))
+    if rel_dir == os.curdir:
+        rel_dir = ""
+    directory = catalog["directories"].get(rel_dir)
+    links = directory["links"].get(name) if directory else None
+    if links is None:
+        return {"gpx": None, "csv": None, "streams": [], "overlays": [], "sidecars": []}
+
+    folder = os.path.join(catalog["root"], rel_dir)
+    return {
+        "gpx": os.path.join(folder, links["gpx"]) if links["gpx"] else None,
+        "csv": os.path.join(folder, links["csv"]) if links["csv"] else None,
+        "streams": [os.path.join(folder, n) for n in links["streams"]],
+        "overlays": [os.path.join(folder, n) for n in links["overlays"]],
+        "sidecars": [os.path.join(folder, n) for n in links["sidecars"]],
+    }
+
+
+if __name__ == "__main__":
+    # --- CONFIGURATION ---
+    target_gopro_folder = "/Volumes/LaCie/GoPro"
+    # --- END CONFIGURATION ---
+
+    catalog = update_catalog(target_gopro_folder)
+    for kind in ("clip", "gpx", "csv", "stream", "overlay", "sidecar"):
+        print(f"{kind}: {len(files_of_kind(catalog, kind))}")
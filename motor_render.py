@@ -0,0 +1,611 @@
+import gpxpy
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import matplotlib.animation as animation
+import contextily as cx
+from pyproj import Transformer
+import numpy as np
+import os
+import json
+import shutil
+import hashlib
+import subprocess
+
+import media_catalog
+
+# Motor común de renderizado de la telemetría. animate_gpx_map.py (con mapa base)
+# y generar_telemetria_para_nle.py (transparente, sin mapa) son envoltorios de
+# este módulo, y renderizar_variantes() permite generar varias versiones del
+# mismo GPX leyendo, proyectando y recorriendo el track una sola vez.
+
+# Frames por segmento de vídeo. Un render interrumpido se reanuda desde el
+# primer segmento que falte, así que como mucho se repite este número de frames.
+FRAMES_POR_SEGMENTO = 1500
+
+
+def cargar_track_proyectado(ruta_archivo_gpx):
+    """
+    Lee el GPX y devuelve el track como arrays de numpy:
+    (lon, lat, x, y, t_s, ele, tiempo_inicio), con x/y en EPSG:3857, t_s en
+    segundos desde el primer punto y ele = NaN donde no hay altura.
+    Devuelve None si el archivo no tiene puntos válidos.
+    """
+    with open(ruta_archivo_gpx, 'r', encoding='utf-8') as gpx_file_content:
+        gpx = gpxpy.parse(gpx_file_content)
+
+    if not gpx.tracks or not gpx.tracks[0].segments:
+        print(f"No se encontraron tracks/segmentos en {ruta_archivo_gpx}.")
+        return None
+
+    puntos = [p for segment in gpx.tracks[0].segments for p in segment.points
+              if p.time and p.longitude is not None and p.latitude is not None]
+    if not puntos:
+        print(f"No se encontraron puntos con datos válidos en {ruta_archivo_gpx}.")
+        return None
+
+    tiempo_inicio = puntos[0].time
+    lon = np.array([p.longitude for p in puntos], dtype=float)
+    lat = np.array([p.latitude for p in puntos], dtype=float)
+    t_s = np.array([(p.time - tiempo_inicio).total_seconds() for p in puntos], dtype=float)
+    ele = np.array([np.nan if p.elevation is None else p.elevation for p in puntos], dtype=float)
+
+    transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
+    x, y = transformer.transform(lon, lat)
+    return lon, lat, np.asarray(x), np.asarray(y), t_s, ele, tiempo_inicio
+
+
+def altura_suavizada(ele, ventana_puntos):
+    """
+    Media de las últimas ventana_puntos alturas para cada punto, ignorando
+    las que faltan (NaN si no hay ninguna en la ventana).
+    """
+    validos = ~np.isnan(ele)
+    suma = np.concatenate(([0.0], np.cumsum(np.where(validos, ele, 0.0))))
+    cuenta = np.concatenate(([0], np.cumsum(validos)))
+    fin = np.arange(1, len(ele) + 1)
+    inicio = np.maximum(0, fin - ventana_puntos)
+    n = cuenta[fin] - cuenta[inicio]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, (suma[fin] - suma[inicio]) / n, np.nan)
+
+
+def aplicar_umbral_altura(suavizada, umbral_m):
+    """
+    Valor de altura mostrado en cada paso: solo cambia cuando la altura se
+    aleja umbral_m del último valor mostrado. NaN = "N/A".
+    La histéresis depende del valor anterior, así que es secuencial.
+    """
+    mostrada = np.empty_like(suavizada)
+    ultima = None
+    for i, valor in enumerate(suavizada.tolist()):
+        if valor != valor:  # NaN
+            ultima = None
+        elif ultima is None or abs(valor - ultima) >= umbral_m:
+            ultima = valor
+        mostrada[i] = np.nan if ultima is None else ultima
+    return mostrada
+
+
+def indices_frames_animacion(num_puntos, puntos_gpx_por_frame_anim):
+    """Último punto GPX que muestra cada frame de la animación."""
+    num_frames = (num_puntos + puntos_gpx_por_frame_anim - 1) // puntos_gpx_por_frame_anim
+    return np.minimum((np.arange(num_frames) + 1) * puntos_gpx_por_frame_anim - 1, num_puntos - 1)
+
+
+def altura_por_frame(ele, idx_frame, ventana_puntos, umbral_m):
+    """
+    Altura y texto que muestra cada frame de la animación, con la histéresis
+    evaluada frame a frame. Antes de la primera altura válida el texto queda
+    vacío; después, "N/A". Devuelve (mostrada, textos), con NaN donde no hay valor.
+    """
+    mostrada = aplicar_umbral_altura(altura_suavizada(ele, ventana_puntos)[idx_frame], umbral_m)
+    textos = []
+    hubo_altura = False
+    for valor in mostrada.tolist():
+        if valor == valor:
+            hubo_altura = True
+            textos.append(f'Altura: {valor:.1f} m')
+        else:
+            textos.append('Altura: N/A' if hubo_altura else '')
+    return mostrada, textos
+
+
+def limites_mapa(x, y, idx_primer_punto_a_dibujar):
+    """Límites del encuadre: la parte visible de la ruta con un 5% de margen."""
+    if idx_primer_punto_a_dibujar < len(x):
+        x, y = x[idx_primer_punto_a_dibujar:], y[idx_primer_punto_a_dibujar:]
+        min_x, max_x, min_y, max_y = x.min(), x.max(), y.min(), y.max()
+        margin_x = (max_x - min_x) * 0.05 if max_x != min_x else 100
+        margin_y = (max_y - min_y) * 0.05 if max_y != min_y else 100
+    else:
+        min_x, max_x, min_y, max_y = x.min(), x.max(), y.min(), y.max()
+        margin_x = margin_y = 100
+    return min_x - margin_x, max_x + margin_x, min_y - margin_y, max_y + margin_y
+
+
+def preparar_track(ruta_archivo_gpx,
+                   intervalo_frames_ms_referencia=50,
+                   puntos_gpx_por_frame_anim=1,
+                   segundos_inicio_dibujo=0,
+                   ventana_promedio_altura_puntos=5,
+                   umbral_actualizacion_altura_m=0.5
+                   ):
+    """
+    Lee y proyecta el GPX y calcula de una vez el plan de frames: qué punto
+    corresponde a cada frame, si ya se dibuja la línea, el texto de altura y
+    los FPS que sincronizan el vídeo con la duración real del track.
+    Así cada frame depende solo de su índice y se puede dibujar en cualquier
+    orden y para cualquier número de variantes.
+    Devuelve un dict, o None si no hay nada que animar.
+    """
+    nombre_gpx = os.path.basename(ruta_archivo_gpx)
+    print(f"Leyendo archivo GPX: {ruta_archivo_gpx}")
+    track = cargar_track_proyectado(ruta_archivo_gpx)
+    if track is None:
+        return None
+    _, _, x, y, t_s, ele, _ = track
+    num_puntos = len(x)
+    print(f"Total de puntos GPX leídos de {nombre_gpx}: {num_puntos}")
+
+    idx_primer_punto_a_dibujar = int(np.searchsorted(t_s, segundos_inicio_dibujo, side='left'))
+    if idx_primer_punto_a_dibujar >= num_puntos and segundos_inicio_dibujo > 0:
+        print("ADVERTENCIA: Todos los puntos están antes del tiempo de inicio de dibujo especificado.")
+
+    num_total_frames_animacion = (num_puntos + puntos_gpx_por_frame_anim - 1) // puntos_gpx_por_frame_anim
+    if num_total_frames_animacion == 0:
+        print(f"No hay frames para animar en {nombre_gpx}.")
+        return None
+
+    intervalo_ms_final_animacion = intervalo_frames_ms_referencia
+    fps_video_final = max(1, 1000 / intervalo_ms_final_animacion)
+
+    if num_puntos > 1:
+        duracion_real_gpx_s = float(t_s[-1])
+        print(f"Duración real del track GPX ({nombre_gpx}): {duracion_real_gpx_s:.2f} segundos.")
+
+        if duracion_real_gpx_s > 0:
+            intervalo_ms_calculado = (duracion_real_gpx_s * 1000.0) / num_total_frames_animacion
+            min_intervalo_ms = 20 # Minimum interval in ms (equivalent to 50 FPS)
+            if intervalo_ms_calculado < min_intervalo_ms:
+                print(f"ADVERTENCIA (archivo: {nombre_gpx}): Intervalo ({intervalo_ms_calculado:.2f} ms) muy bajo. Usando {min_intervalo_ms} ms.")
+                intervalo_ms_final_animacion = min_intervalo_ms
+            else:
+                intervalo_ms_final_animacion = intervalo_ms_calculado
+            fps_video_final = 1000.0 / intervalo_ms_final_animacion
+            print(f"Para sincronizar ({nombre_gpx}): {num_total_frames_animacion} frames, intervalo: {intervalo_ms_final_animacion:.2f} ms, FPS: {fps_video_final:.2f}.")
+        else:
+            print(f"Duración GPX cero o negativa ({nombre_gpx}). Usando intervalo de referencia.")
+    else:
+        print(f"Solo 1 punto en GPX ({nombre_gpx}). Usando intervalo de referencia.")
+
+    idx_frame = indices_frames_animacion(num_puntos, puntos_gpx_por_frame_anim)
+    _, textos_altura = altura_por_frame(ele, idx_frame, ventana_promedio_altura_puntos,
+                                        umbral_actualizacion_altura_m)
+
+    return {
+        "nombre": nombre_gpx,
+        "x": x,
+        "y": y,
+        "idx_primer_punto_a_dibujar": idx_primer_punto_a_dibujar,
+        "limites": limites_mapa(x, y, idx_primer_punto_a_dibujar),
+        "num_frames": num_total_frames_animacion,
+        "idx_frame": idx_frame,
+        "dibujar_linea": t_s[idx_frame] >= segundos_inicio_dibujo,
+        "textos_altura": textos_altura,
+        "fps": fps_video_final,
+        "intervalo_ms": intervalo_ms_final_animacion,
+    }
+
+
+def crear_figura_variante(track, variante):
+    """
+    Crea la figura de una variante: con mapa base si variante["map_source"]
+    es un proveedor de contextily, o transparente si es None.
+    Devuelve (fig, (linea, marcador, texto_altura), mapa_base_cargado).
+    """
+    map_source = variante.get("map_source")
+    fig, ax = plt.subplots(figsize=variante.get("tamano_figura", (10, 8)))
+    fig.subplots_adjust(left=0, right=1, bottom=0, top=1, wspace=0, hspace=0)
+    if map_source is None:
+        fig.patch.set_alpha(0.0)
+        ax.patch.set_alpha(0.0)
+
+    min_x, max_x, min_y, max_y = track["limites"]
+    ax.set_xlim(min_x, max_x)
+    ax.set_ylim(min_y, max_y)
+
+    mapa_base_cargado = False
+    if map_source is not None:
+        print(f"Añadiendo mapa base usando: {map_source} para {track['nombre']}")
+        try:
+            cx.add_basemap(ax, crs="EPSG:3857", source=map_source, zoom='auto')
+            mapa_base_cargado = True
+        except Exception as e:
+            print(f"Error al añadir el mapa base para {track['nombre']}: {e}")
+
+    ax.set_axis_off()
+
+    line, = ax.plot([], [], lw=variante.get("grosor_linea", 4), color='dodgerblue', alpha=0.8, zorder=5)
+    current_point_marker, = ax.plot([], [], 'o', color='red', markersize=variante.get("tamano_punto", 10),
+                                    markeredgecolor='white', zorder=6)
+
+    elevation_text = ax.text(0.02, 0.98, '', transform=ax.transAxes, fontsize=10,
+                             color='black', verticalalignment='top',
+                             bbox=dict(boxstyle='round,pad=0.3', fc='white', alpha=0.7), zorder=7)
+    return fig, (line, current_point_marker, elevation_text), mapa_base_cargado
+
+
+def dibujar_frame(track, artistas, frame_idx_anim):
+    """Deja los artistas de una variante en el estado del frame indicado."""
+    line, current_point_marker, elevation_text = artistas
+    idx_ultimo_gpx_a_considerar = track["idx_frame"][frame_idx_anim]
+    x, y = track["x"], track["y"]
+
+    elevation_text.set_text(track["textos_altura"][frame_idx_anim])
+    current_point_marker.set_data([x[idx_ultimo_gpx_a_considerar]], [y[idx_ultimo_gpx_a_considerar]])
+    if track["dibujar_linea"][frame_idx_anim]:
+        idx_primer = track["idx_primer_punto_a_dibujar"]
+        line.set_data(x[idx_primer:idx_ultimo_gpx_a_considerar + 1], y[idx_primer:idx_ultimo_gpx_a_considerar + 1])
+        current_point_marker.set_alpha(1) # Visible
+    else: # Puntos antes del inicio del dibujo
+        line.set_data([], []) # No dibujar línea aún
+        current_point_marker.set_alpha(0.3) # Pero hacerlo semitransparente
+
+
+def _cerrar_writer(writer):
+    """Termina un encoder que falló o quedó a medias, ignorando sus errores."""
+    try:
+        writer.finish()
+    except Exception:
+        pass
+
+
+def _directorio_partes(archivo_salida):
+    # Oculto (empieza por ".") para que el catálogo no tome los segmentos por clips
+    carpeta, nombre = os.path.split(os.path.abspath(archivo_salida))
+    return os.path.join(carpeta, f".{nombre}.partes")
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _parametros_render(ruta_archivo_gpx, track, variante, ajustes):
+    """
+    Todo lo que determina el contenido de los segmentos. Si algo cambia entre
+    ejecuciones, los segmentos ya renderizados no sirven y se descartan.
+    Si el mapa base se cargó o no se anota aparte (ver _cargar_checkpoint).
+    """
+    parametros = {
+        "gpx": os.path.abspath(ruta_archivo_gpx),
+        # Por contenido y no por mtime: la extracción reescribe el GPX en cada pasada
+        "gpx_sha256": _sha256(ruta_archivo_gpx),
+        "ajustes": ajustes,
+        "fps": track["fps"],
+        "num_frames": track["num_frames"],
+        "variante": {k: v for k, v in variante.items() if k not in ("archivo_salida", "sufijo")},
+    }
+    # Ida y vuelta por JSON para comparar igual que lo leído del checkpoint
+    return json.loads(json.dumps(parametros, default=str, sort_keys=True))
+
+
+def _guardar_checkpoint(dir_partes, checkpoint):
+    ruta = os.path.join(dir_partes, "checkpoint.json")
+    with open(f"{ruta}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(f"{ruta}.tmp", ruta)
+
+
+def _cargar_checkpoint(dir_partes, parametros, mapa_base_cargado):
+    """
+    Devuelve el checkpoint de una salida con solo los segmentos que siguen
+    siendo válidos (existen y coinciden tamaño y SHA-256). Si no hay
+    checkpoint o se hizo con otros parámetros, empieza uno nuevo.
+
+    Si los segmentos hechos tienen mapa base y esta vez no se pudo cargar
+    (sin red, por ejemplo), lanza RuntimeError y conserva los segmentos:
+    se reanudará cuando el mapa vuelva a estar disponible.
+    """
+    ruta = os.path.join(dir_partes, "checkpoint.json")
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        checkpoint = None
+
+    if (checkpoint is not None and checkpoint.get("parametros") == parametros
+            and checkpoint.get("mapa_base_cargado") and not mapa_base_cargado):
+        raise RuntimeError(f"los segmentos ya renderizados tienen mapa base y esta vez no se pudo cargar; "
+                           f"se conservan en {dir_partes} para reanudar más tarde")
+
+    if (checkpoint is None or checkpoint.get("parametros") != parametros
+            or checkpoint.get("mapa_base_cargado") != mapa_base_cargado):
+        if os.path.isdir(dir_partes):
+            shutil.rmtree(dir_partes)
+        os.makedirs(dir_partes)
+        checkpoint = {"parametros": parametros, "mapa_base_cargado": mapa_base_cargado, "segmentos": {}}
+        _guardar_checkpoint(dir_partes, checkpoint)
+        return checkpoint
+
+    # Restos de una ejecución interrumpida a mitad de segmento
+    for nombre in os.listdir(dir_partes):
+        if nombre.endswith(".tmp.mp4"):
+            os.remove(os.path.join(dir_partes, nombre))
+
+    validos = {}
+    for clave, info in checkpoint["segmentos"].items():
+        ruta_segmento = os.path.join(dir_partes, info["archivo"])
+        if (os.path.isfile(ruta_segmento) and os.path.getsize(ruta_segmento) == info["tamano"]
+                and _sha256(ruta_segmento) == info["sha256"]):
+            validos[clave] = info
+        else:
+            print(f"ADVERTENCIA: Segmento dañado o ausente, se volverá a renderizar: {ruta_segmento}")
+    checkpoint["segmentos"] = validos
+    return checkpoint
+
+
+def _concatenar_segmentos(dir_partes, checkpoint, archivo_salida):
+    """Une los segmentos con el demuxer concat de ffmpeg, sin recodificar."""
+    ruta_lista = os.path.join(dir_partes, "lista.txt")
+    with open(ruta_lista, 'w', encoding='utf-8') as f:
+        for clave in sorted(checkpoint["segmentos"]):
+            f.write(f"file '{checkpoint['segmentos'][clave]['archivo']}'\n")
+
+    ruta_tmp = f"{archivo_salida}.tmp"
+    cmd = [
+        mpl.rcParams['animation.ffmpeg_path'],
+        "-y", "-v", "error",
+        "-f", "concat", "-safe", "0", "-i", ruta_lista,
+        "-c", "copy",
+        "-f", "mp4", ruta_tmp
+    ]
+    subprocess.run(cmd, capture_output=True, text=True, check=True)
+    os.replace(ruta_tmp, archivo_salida)
+
+
+def renderizar_variantes(ruta_archivo_gpx,
+                         variantes,
+                         intervalo_frames_ms_referencia=50,
+                         puntos_gpx_por_frame_anim=1,
+                         segundos_inicio_dibujo=0,
+                         ventana_promedio_altura_puntos=5,
+                         umbral_actualizacion_altura_m=0.5,
+                         frames_por_segmento=FRAMES_POR_SEGMENTO
+                         ):
+    """
+    Renderiza varias versiones del mismo GPX en una sola pasada.
+
+    El track se lee, proyecta y planifica una vez; luego un único bucle de
+    frames actualiza cada variante y envía el frame a su propio encoder
+    (un proceso ffmpeg por variante). Cada variante es un dict con:
+        archivo_salida  Ruta del vídeo (obligatorio).
+        map_source      Proveedor de contextily, o None para fondo transparente.
+        grosor_linea    Grosor de la línea de la ruta.
+        tamano_punto    Tamaño del marcador del punto actual.
+
+    Cada salida se codifica en segmentos de frames_por_segmento frames dentro
+    de la carpeta oculta .<salida>.partes, con un checkpoint.json que anota
+    los segmentos terminados y los parámetros del render. Si el proceso se
+    interrumpe, la siguiente ejecución valida los segmentos hechos, sigue por
+    el primero que falta y al final los une sin recodificar. El resultado es
+    idéntico al de un render sin interrupciones.
+
+    Devuelve {archivo_salida: True/False}.
+    """
+    resultados = {v["archivo_salida"]: False for v in variantes}
+    try:
+        track = preparar_track(ruta_archivo_gpx,
+                               intervalo_frames_ms_referencia=intervalo_frames_ms_referencia,
+                               puntos_gpx_por_frame_anim=puntos_gpx_por_frame_anim,
+                               segundos_inicio_dibujo=segundos_inicio_dibujo,
+                               ventana_promedio_altura_puntos=ventana_promedio_altura_puntos,
+                               umbral_actualizacion_altura_m=umbral_actualizacion_altura_m)
+    except FileNotFoundError:
+        print(f"Error: No se encontró el archivo GPX en la ruta: {ruta_archivo_gpx}")
+        return resultados
+    except Exception as e:
+        print(f"Ocurrió un error general procesando {ruta_archivo_gpx}: {e}")
+        import traceback
+        traceback.print_exc()
+        return resultados
+    if track is None:
+        return resultados
+
+    nombre_gpx = track["nombre"]
+    num_frames = track["num_frames"]
+    num_segmentos = (num_frames + frames_por_segmento - 1) // frames_por_segmento
+    ajustes = {
+        "intervalo_frames_ms_referencia": intervalo_frames_ms_referencia,
+        "puntos_gpx_por_frame_anim": puntos_gpx_por_frame_anim,
+        "segundos_inicio_dibujo": segundos_inicio_dibujo,
+        "ventana_promedio_altura_puntos": ventana_promedio_altura_puntos,
+        "umbral_actualizacion_altura_m": umbral_actualizacion_altura_m,
+        "frames_por_segmento": frames_por_segmento,
+    }
+
+    estados = []  # Una entrada por variante en curso
+
+    def descartar(estado, mensaje):
+        # Una variante que falla no detiene el resto
+        print(mensaje)
+        estados.remove(estado)
+        if estado["writer"] is not None:
+            _cerrar_writer(estado["writer"])
+            estado["writer"] = None
+        plt.close(estado["fig"])
+
+    try:
+        for variante in variantes:
+            archivo_salida = variante["archivo_salida"]
+            fig = None
+            try:
+                fig, artistas, mapa_base_cargado = crear_figura_variante(track, variante)
+                dir_partes = _directorio_partes(archivo_salida)
+                checkpoint = _cargar_checkpoint(
+                    dir_partes, _parametros_render(ruta_archivo_gpx, track, variante, ajustes), mapa_base_cargado)
+                estados.append({"archivo_salida": archivo_salida, "fig": fig, "artistas": artistas,
+                                "dir_partes": dir_partes, "checkpoint": checkpoint, "writer": None})
+                if checkpoint["segmentos"]:
+                    print(f"Reanudando {archivo_salida}: {len(checkpoint['segmentos'])}/{num_segmentos} segmentos ya renderizados.")
+            except Exception as e:
+                print(f"Error preparando la variante {archivo_salida}: {e}")
+                if fig is not None:
+                    plt.close(fig)
+
+        print(f"Creando animación para {nombre_gpx} con {num_frames} frames totales ({num_segmentos} segmentos) y {len(estados)} variantes a {track['fps']:.2f} FPS...")
+        for segmento in range(num_segmentos):
+            clave = f"{segmento:05d}"
+            pendientes = [e for e in estados if clave not in e["checkpoint"]["segmentos"]]
+            if not pendientes:
+                continue
+            primer_frame = segmento * frames_por_segmento
+            ultimo_frame = min(num_frames, primer_frame + frames_por_segmento)
+
+            for estado in list(pendientes):
+                estado["ruta_tmp"] = os.path.join(estado["dir_partes"], f"seg_{clave}.{os.getpid()}.tmp.mp4")
+                try:
+                    estado["writer"] = animation.FFMpegWriter(fps=track["fps"])
+                    estado["writer"].setup(estado["fig"], estado["ruta_tmp"], dpi=estado["fig"].dpi)
+                except Exception as e:
+                    pendientes.remove(estado)
+                    descartar(estado, f"Error preparando el segmento {clave} de {estado['archivo_salida']}: {e}")
+
+            for frame_idx_anim in range(primer_frame, ultimo_frame):
+                for estado in list(pendientes):
+                    try:
+                        dibujar_frame(track, estado["artistas"], frame_idx_anim)
+                        estado["writer"].grab_frame(transparent=True, facecolor='none')
+                    except Exception as e:
+                        pendientes.remove(estado)
+                        descartar(estado, f"Error guardando la animación {estado['archivo_salida']} (frame {frame_idx_anim + 1}): {e}")
+
+                if frame_idx_anim % max(1, (num_frames // 20)) == 0: # Print progress roughly 20 times
+                    print(f"  Procesando frame ({nombre_gpx}): {frame_idx_anim+1}/{num_frames}")
+
+            for estado in list(pendientes):
+                writer, estado["writer"] = estado["writer"], None
+                try:
+                    writer.finish()
+                    nombre_segmento = f"seg_{clave}.mp4"
+                    ruta_segmento = os.path.join(estado["dir_partes"], nombre_segmento)
+                    os.replace(estado["ruta_tmp"], ruta_segmento)
+                    estado["checkpoint"]["segmentos"][clave] = {
+                        "archivo": nombre_segmento,
+                        "frames": [primer_frame, ultimo_frame],
+                        "tamano": os.path.getsize(ruta_segmento),
+                        "sha256": _sha256(ruta_segmento),
+                    }
+                    _guardar_checkpoint(estado["dir_partes"], estado["checkpoint"])
+                except Exception as e:
+                    descartar(estado, f"Error cerrando el segmento {clave} de {estado['archivo_salida']}: {e}")
+
+        for estado in list(estados):
+            archivo_salida = estado["archivo_salida"]
+            try:
+                _concatenar_segmentos(estado["dir_partes"], estado["checkpoint"], archivo_salida)
+                shutil.rmtree(estado["dir_partes"])
+                resultados[archivo_salida] = True
+                print(f"¡Animación guardada exitosamente en {archivo_salida}!")
+            except subprocess.CalledProcessError as e:
+                print(f"Error uniendo los segmentos de {archivo_salida}: {e.stderr[:500] if e.stderr else e}")
+            except Exception as e:
+                print(f"Error uniendo los segmentos de {archivo_salida}: {e}")
+
+        print(f"Duración esperada del video ({nombre_gpx}): {num_frames / track['fps']:.2f} segundos.")
+    finally:
+        for estado in estados:
+            if estado["writer"] is not None:
+                _cerrar_writer(estado["writer"])
+            plt.close(estado["fig"])
+
+    return resultados
+
+
+def procesar_directorio_gpx_variantes(directorio_raiz,
+                                      variantes,
+                                      intervalo_ref, puntos_frame, seg_inicio,
+                                      ventana_altura, umbral_altura
+                                      ):
+    """
+    Escanea un directorio en busca de archivos .gpx y genera todas las
+    variantes de cada uno en una sola pasada. Cada variante lleva un "sufijo"
+    (p. ej. "-gps.mp4") en lugar de archivo_salida.
+    """
+    archivos_gpx_encontrados = 0
+    videos_ok = 0
+    videos_con_fallo = 0
+
+    print(f"Iniciando escaneo de GPX en el directorio: {directorio_raiz}")
+    catalogo = media_catalog.update_catalog(directorio_raiz)
+    for ruta_completa_gpx in media_catalog.files_of_kind(catalogo, "gpx"):
+        archivos_gpx_encontrados += 1
+        base_salida = os.path.splitext(ruta_completa_gpx)[0]
+        variantes_gpx = [dict(v, archivo_salida=f"{base_salida}{v['sufijo']}") for v in variantes]
+
+        print("\n====================================================================")
+        print(f"==> Procesando archivo GPX: {ruta_completa_gpx}")
+        for variante in variantes_gpx:
+            print(f"    Video de salida: {variante['archivo_salida']}")
+        print("====================================================================")
+
+        resultados = renderizar_variantes(
+            ruta_archivo_gpx=ruta_completa_gpx,
+            variantes=variantes_gpx,
+            intervalo_frames_ms_referencia=intervalo_ref,
+            puntos_gpx_por_frame_anim=puntos_frame,
+            segundos_inicio_dibujo=seg_inicio,
+            ventana_promedio_altura_puntos=ventana_altura,
+            umbral_actualizacion_altura_m=umbral_altura
+        )
+        videos_ok += sum(1 for ok in resultados.values() if ok)
+        videos_con_fallo += sum(1 for ok in resultados.values() if not ok)
+
+        print("--------------------------------------------------------------------\n")
+
+    print("\n======= RESUMEN DEL PROCESAMIENTO POR LOTES =======")
+    print(f"Directorio escaneado: {directorio_raiz}")
+    print(f"Total de archivos GPX encontrados: {archivos_gpx_encontrados}")
+    print(f"Videos generados exitosamente: {videos_ok}")
+    print(f"Videos con fallo durante el procesamiento: {videos_con_fallo}")
+    print("===================================================")
+
+
+if __name__ == "__main__":
+
+    directorio_raiz_a_procesar = "/Volumes/LaCie/GoPro"
+
+    intervalo_referencia_ms_lote = 50
+    puntos_gpx_por_frame_lote = 5
+    segundos_para_empezar_dibujo_lote = 0
+    ventana_puntos_altura_lote = 10
+    umbral_cambio_altura_lote = 25.0
+
+    # Cada variante se renderiza en el mismo bucle de frames. Los sufijos deben
+    # empezar por "-gps" o "-telemetry-no_map" para que el catálogo los
+    # reconozca como vídeos renderizados y no como clips.
+    variantes_lote = [
+        {"sufijo": "-gps.mp4", "map_source": cx.providers.OpenStreetMap.Mapnik,
+         "grosor_linea": 12, "tamano_punto": 16},
+        {"sufijo": "-telemetry-no_map.mp4", "map_source": None,
+         "grosor_linea": 8, "tamano_punto": 14},
+        # {"sufijo": "-telemetry-no_map-fino.mp4", "map_source": None,
+        #  "grosor_linea": 4, "tamano_punto": 10},
+    ]
+
+    if not os.path.isdir(directorio_raiz_a_procesar):
+        print(f"Error: El directorio especificado '{directorio_raiz_a_procesar}' no existe o no es un directorio.")
+        print("Por favor, verifica la ruta en la variable 'directorio_raiz_a_procesar' dentro del script.")
+    else:
+        procesar_directorio_gpx_variantes(
+            directorio_raiz_a_procesar,
+            variantes=variantes_lote,
+            intervalo_ref=intervalo_referencia_ms_lote,
+            puntos_frame=puntos_gpx_por_frame_lote,
+            seg_inicio=segundos_para_empezar_dibujo_lote,
+            ventana_altura=ventana_puntos_altura_lote,
+            umbral_altura=umbral_cambio_altura_lote
+        )
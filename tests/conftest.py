@@ -0,0 +1,31 @@
+import os
+import sys
+import datetime
+
+import pytest
+
+# The scripts live at the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def write_gpx():
+    """Writes a synthetic single-segment GPX: one point every step_s seconds."""
+    gpxpy_gpx = pytest.importorskip("gpxpy.gpx")
+
+    def write(path, elevations, step_s=0.1):
+        gpx = gpxpy_gpx.GPX()
+        track = gpxpy_gpx.GPXTrack()
+        segment = gpxpy_gpx.GPXTrackSegment()
+        gpx.tracks.append(track)
+        track.segments.append(segment)
+        start = datetime.datetime(2024, 5, 1, 10, 0, 0, tzinfo=datetime.timezone.utc)
+        for i, elevation in enumerate(elevations):
+            segment.points.append(gpxpy_gpx.GPXTrackPoint(
+                latitude=-33.45 + i * 1e-5, longitude=-70.66 + i * 2e-5, elevation=elevation,
+                time=start + datetime.timedelta(seconds=i * step_s)))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(gpx.to_xml())
+        return str(path)
+
+    return write
@@ -0,0 +1,135 @@
+import csv
+import struct
+
+import pytest
+
+import gpmf_streams
+
+
+def _box(box_type, payload):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _full_box(box_type, payload):
+    return _box(box_type, b"\0\0\0\0" + payload)
+
+
+def _klv(key, type_char, struct_size, values_fmt=None, values=(), raw=None):
+    if raw is None:
+        raw = b"".join(struct.pack(f">{values_fmt}", *row) for row in values)
+    repeat = len(raw) // struct_size
+    return (key.encode("latin-1") + type_char.encode("latin-1") + bytes([struct_size])
+            + struct.pack(">H", repeat) + raw + b"\0" * (-len(raw) % 4))
+
+
+def _nested(key, *children):
+    return _klv(key, "\0", 1, raw=b"".join(children))
+
+
+def _payloads():
+    accl = [
+        [(100, 200, 300), (-100, 0, 50)],
+        [(1, 2, 3), (4, 5, 6)],
+        [(0, 0, 100), (0, 0, -100)],
+    ]
+
+    def accl_stream(samples):
+        return _nested("STRM",
+                       _klv("ORIN", "c", 1, raw=b"ZXY"),
+                       _klv("SCAL", "s", 2, "h", [(100,)]),
+                       _klv("ACCL", "s", 6, "3h", samples))
+
+    gps5 = _nested("STRM",
+                   _klv("GPSF", "L", 4, "I", [(3,)]),
+                   _klv("GPSP", "S", 2, "H", [(250,)]),
+                   _klv("SCAL", "l", 4, "i", [(10000000,), (10000000,), (1000,), (1000,), (100,)]),
+                   _klv("GPS5", "l", 20, "5i", [(-334500000, -706600000, 520000, 1500, 160)]))
+    gps9 = _nested("STRM",
+                   _klv("TYPE", "c", 1, raw=b"lllllllSS"),
+                   _klv("SCAL", "l", 4, "i", [(10000000,), (10000000,), (1000,), (1000,), (100,),
+                                              (1,), (1000,), (100,), (1,)]),
+                   _klv("GPS9", "?", 32, "7i2H",
+                        [(-334500100, -706600200, 521500, 1250, 130, 8887, 36000500, 180, 3)]))
+    gyro = _nested("STRM", _klv("GYRO", "q", 12, "3i", [(65536, 32768, -131072)]))
+    cori = _nested("STRM", _klv("CORI", "Q", 32, "4q", [(1 << 32, 0, 1 << 31, -(1 << 32))]))
+
+    return [
+        _nested("DEVC", accl_stream(accl[0]), gps5),
+        _nested("DEVC", accl_stream(accl[1]), gps9),
+        _nested("DEVC", accl_stream(accl[2]), gps5, gyro, cori),
+    ]
+
+
+def _write_mp4(path, payloads, use_co64):
+    ftyp = _box(b"ftyp", b"mp41\0\0\0\0mp41")
+    # Chunk 1 holds samples 0-1, chunk 2 holds sample 2, with unrelated bytes in between
+    gap = b"\xff" * 12
+    mdat_start = len(ftyp) + 8
+    chunk_offsets = [mdat_start, mdat_start + len(payloads[0]) + len(payloads[1]) + len(gap)]
+    mdat = _box(b"mdat", payloads[0] + payloads[1] + gap + payloads[2])
+
+    sizes = [len(p) for p in payloads]
+    assert len(set(sizes)) == 3
+    if use_co64:
+        chunk_box = _full_box(b"co64", struct.pack(">I2Q", 2, *chunk_offsets))
+    else:
+        chunk_box = _full_box(b"stco", struct.pack(">I2I", 2, *chunk_offsets))
+    stbl = _box(b"stbl",
+                _full_box(b"stsd", struct.pack(">I", 1) + _box(b"gpmd", b"\0" * 8))
+                + _full_box(b"stts", struct.pack(">I4I", 2, 2, 1000, 1, 500))
+                + _full_box(b"stsc", struct.pack(">I6I", 2, 1, 2, 1, 2, 1, 1))
+                + _full_box(b"stsz", struct.pack(">II3I", 0, 3, *sizes))
+                + chunk_box)
+    mdhd = _full_box(b"mdhd", struct.pack(">IIII", 0, 0, 1000, 2500) + b"\0" * 4)
+    trak = _box(b"trak", _box(b"mdia", mdhd + _box(b"minf", stbl)))
+    with open(path, "wb") as f:
+        f.write(ftyp + mdat + _box(b"moov", trak))
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    return rows[0], [[float(v) for v in row] for row in rows[1:]]
+
+
+@pytest.mark.parametrize("use_co64", [False, True])
+def test_extract_streams_from_synthetic_mp4(tmp_path, use_co64):
+    mp4_path = tmp_path / "GX010001.MP4"
+    _write_mp4(mp4_path, _payloads(), use_co64)
+
+    outputs = gpmf_streams.extract_streams(str(mp4_path))
+
+    assert sorted(outputs) == ["ACCL", "CORI", "GPS5", "GPS9", "GYRO"]
+    assert outputs["ACCL"] == str(tmp_path / "GX010001_ACCL.csv")
+
+    # ORIN names the axes; SCAL applies; samples spread over each payload's duration
+    header, rows = _read_csv(outputs["ACCL"])
+    assert header == ["time_s", "z", "x", "y"]
+    assert rows == [
+        [0.0, 1.0, 2.0, 3.0], [0.5, -1.0, 0.0, 0.5],
+        [1.0, 0.01, 0.02, 0.03], [1.5, 0.04, 0.05, 0.06],
+        [2.0, 0.0, 0.0, 1.0], [2.25, 0.0, 0.0, -1.0],
+    ]
+
+    # Per-value SCAL and sticky GPSF/GPSP columns, in the two payloads that carry GPS5
+    header, rows = _read_csv(outputs["GPS5"])
+    assert header == ["time_s", "latitude", "longitude", "altitude", "speed_2d", "speed_3d", "fix", "dop"]
+    assert rows == [[0.0, -33.45, -70.66, 520.0, 1.5, 1.6, 3.0, 2.5],
+                    [2.0, -33.45, -70.66, 520.0, 1.5, 1.6, 3.0, 2.5]]
+
+    # Complex '?' samples described by TYPE
+    header, rows = _read_csv(outputs["GPS9"])
+    assert header == ["time_s"] + gpmf_streams.STREAM_COLUMNS["GPS9"]
+    assert rows == [[1.0, -33.45001, -70.66002, 521.5, 1.25, 1.3, 8887.0, 36000.5, 1.8, 3.0]]
+
+    # q (Q15.16) and Q (Q31.32) fixed point
+    assert _read_csv(outputs["GYRO"]) == (["time_s", "x", "y", "z"], [[2.0, 1.0, 0.5, -2.0]])
+    assert _read_csv(outputs["CORI"]) == (["time_s", "w", "x", "y", "z"], [[2.0, 1.0, 0.0, 0.5, -1.0]])
+
+
+def test_file_without_gpmf_track(tmp_path):
+    mp4_path = tmp_path / "clip.mp4"
+    mp4_path.write_bytes(_box(b"ftyp", b"mp41\0\0\0\0") + _box(b"moov", _box(b"mvhd", b"\0" * 100)))
+
+    with pytest.raises(gpmf_streams.GPMFError):
+        gpmf_streams.extract_streams(str(mp4_path))
@@ -0,0 +1,86 @@
+import os
+import re
+import time
+
+import media_catalog
+
+
+def test_overlays_need_a_gpx_next_to_them(tmp_path):
+    for name in ("my-gps-ride.MP4", "GX010001.MP4", "GX010001.gpx", "GX010001-gps.mp4",
+                 "GX010001-gps-fino.mp4", "GX010001-telemetry-no_map.mp4"):
+        (tmp_path / name).write_bytes(b"\0")
+
+    catalog = media_catalog.update_catalog(str(tmp_path), catalog_path=str(tmp_path.parent / "catalog.json"))
+
+    clips = sorted(os.path.basename(p) for p in media_catalog.files_of_kind(catalog, "clip"))
+    assert clips == ["GX010001.MP4", "my-gps-ride.MP4"]
+    derived = media_catalog.derived_files(catalog, str(tmp_path / "GX010001.MP4"))
+    assert derived["gpx"] == str(tmp_path / "GX010001.gpx")
+    assert derived["overlays"] == [str(tmp_path / n) for n in
+                                   ("GX010001-gps-fino.mp4", "GX010001-gps.mp4", "GX010001-telemetry-no_map.mp4")]
+    assert media_catalog.derived_files(catalog, str(tmp_path / "my-gps-ride.MP4"))["overlays"] == []
+
+
+
+def _set_age(path, seconds):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def _update(root, catalog_path, capsys):
+    catalog = media_catalog.update_catalog(str(root), catalog_path=str(catalog_path))
+    scanned, reused = re.search(r"(\d+) directories scanned, (\d+) unchanged", capsys.readouterr().out).groups()
+    return catalog, int(scanned), int(reused)
+
+
+def test_only_changed_directories_are_rescanned(tmp_path, capsys):
+    root = tmp_path / "GoPro"
+    catalog_path = tmp_path / "catalog.json"
+    (root / "day0").mkdir(parents=True)
+    (root / "day1").mkdir()
+    (root / "fresh").mkdir()
+    for name in ("GX010001.MP4", "GX010001.gpx", "GX010001.csv", "GX010001_GPS5.csv",
+                 "GL010001.LRV", "notes.txt"):
+        (root / "day1" / name).write_bytes(b"\0")
+    (root / "day0" / "GH010002.MP4").write_bytes(b"\0")
+    (root / "fresh" / "GX010003.MP4").write_bytes(b"\0")
+    for path in (root, root / "day0", root / "day1"):
+        _set_age(path, 3600)
+
+    # First run lists everything; "fresh" was modified just now, so it stays unstable
+    catalog, scanned, reused = _update(root, catalog_path, capsys)
+    assert (scanned, reused) == (4, 0)
+    assert catalog["directories"]["fresh"]["unstable"]
+    assert not catalog["directories"]["day1"]["unstable"]
+
+    derived = media_catalog.derived_files(catalog, str(root / "day1" / "GX010001.MP4"))
+    assert derived == {
+        "gpx": str(root / "day1" / "GX010001.gpx"),
+        "csv": str(root / "day1" / "GX010001.csv"),
+        "streams": [str(root / "day1" / "GX010001_GPS5.csv")],
+        "overlays": [],
+        "sidecars": [str(root / "day1" / "GL010001.LRV")],
+    }
+
+    # Nothing changed: only the unstable directory is listed again
+    catalog, scanned, reused = _update(root, catalog_path, capsys)
+    assert (scanned, reused) == (1, 3)
+
+    # A new file in day1, a new subdirectory and a removed one
+    (root / "day1" / "GX010001-gps.mp4").write_bytes(b"\0")
+    (root / "day2").mkdir()
+    (root / "day2" / "GX010004.MP4").write_bytes(b"\0")
+    for name in os.listdir(root / "fresh"):
+        os.remove(root / "fresh" / name)
+    os.rmdir(root / "fresh")
+    for path in (root, root / "day1", root / "day2"):
+        _set_age(path, 1800)
+
+    catalog, scanned, reused = _update(root, catalog_path, capsys)
+    assert (scanned, reused) == (3, 1)
+    assert sorted(catalog["directories"]) == ["", "day0", "day1", "day2"]
+    clips = [os.path.relpath(p, root) for p in media_catalog.files_of_kind(catalog, "clip")]
+    assert clips == [os.path.join("day0", "GH010002.MP4"), os.path.join("day1", "GX010001.MP4"),
+                     os.path.join("day2", "GX010004.MP4")]
+    derived = media_catalog.derived_files(catalog, str(root / "day1" / "GX010001.MP4"))
+    assert derived["overlays"] == [str(root / "day1" / "GX010001-gps.mp4")]
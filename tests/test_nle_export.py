@@ -0,0 +1,52 @@
+import matplotlib
+matplotlib.use("Agg")
+
+import motor_render
+import generar_telemetria_para_nle
+
+
+def _srt_texts(path):
+    with open(path, encoding="utf-8") as f:
+        blocks = f.read().strip().split("\n\n")
+    return [(block.split("\n")[1].split(" --> ")[0], block.split("\n")[2]) for block in blocks]
+
+
+def test_elevation_text_matches_video(tmp_path, write_gpx):
+    # No elevation at first, then a climb whose steps only cross the threshold
+    # at some animation frames, and a gap that shows "N/A"
+    elevations = [None] * 12 + [100 + 0.7 * i for i in range(60)] + [None] * 15 + [150.0] * 13
+    gpx_path = tmp_path / "GX010001.gpx"
+    write_gpx(gpx_path, elevations)
+    settings = dict(segundos_inicio_dibujo=0, ventana_promedio_altura_puntos=3,
+                    umbral_actualizacion_altura_m=2.0)
+
+    track = motor_render.preparar_track(str(gpx_path), puntos_gpx_por_frame_anim=5, **settings)
+    video_texts = []
+    for text in track["textos_altura"]:
+        if not video_texts or video_texts[-1] != text:
+            video_texts.append(text)
+
+    assert generar_telemetria_para_nle.exportar_telemetria_nle(
+        str(gpx_path), fps_proyecto=10, puntos_gpx_por_frame_anim=5, **settings)
+    cues = _srt_texts(tmp_path / "GX010001-nle-altura.srt")
+
+    assert video_texts[0] == ""
+    assert [text for _, text in cues] == video_texts[1:]
+    assert "N/A" in cues[-2][1]
+    # First cue starts when the first animation frame with an elevation is
+    # reached: frame 2 shows points 10-14, and point 14 is at 1.4 s
+    assert cues[0][0] == "00:00:01,400"
+
+
+def test_no_elevation_before_the_first_animation_frame(tmp_path, write_gpx):
+    gpx_path = write_gpx(tmp_path / "GX010002.gpx", [200.0 + i for i in range(40)])
+
+    assert generar_telemetria_para_nle.exportar_telemetria_nle(
+        gpx_path, fps_proyecto=10, puntos_gpx_por_frame_anim=5, ventana_promedio_altura_puntos=1,
+        umbral_actualizacion_altura_m=0.5)
+
+    with open(tmp_path / "GX010002-nle-frames.csv", encoding="utf-8") as f:
+        elevations = [line.rstrip("\n").split(",")[-1] for line in f][1:]
+    # The first animation frame shows points 0-4; point 4 is at 0.4 s
+    assert elevations[:5] == ["", "", "", "", "204.0"]
+    assert _srt_texts(tmp_path / "GX010002-nle-altura.srt")[0] == ("00:00:00,400", "Altura: 204.0 m")
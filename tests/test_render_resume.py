@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import subprocess
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRAMES_POR_SEGMENTO = 25
+NUM_SEGMENTOS = 12          # 300 GPX points, one per frame
+
+AJUSTES = dict(intervalo_frames_ms_referencia=50,
+               puntos_gpx_por_frame_anim=1,
+               ventana_promedio_altura_puntos=5,
+               umbral_actualizacion_altura_m=1.0,
+               frames_por_segmento=FRAMES_POR_SEGMENTO)
+
+# Renders one transparent variant in its own process, so the test can SIGKILL it
+RENDER_SCRIPT = f"""
+import sys, shutil
+import matplotlib as mpl
+mpl.use("Agg")
+if shutil.which(mpl.rcParams["animation.ffmpeg_path"]) is None:
+    import imageio_ffmpeg
+    mpl.rcParams["animation.ffmpeg_path"] = imageio_ffmpeg.get_ffmpeg_exe()
+import motor_render
+gpx_path, output_path = sys.argv[1:3]
+resultados = motor_render.renderizar_variantes(
+    gpx_path,
+    [{{"archivo_salida": output_path, "map_source": None, "grosor_linea": 4,
+      "tamano_punto": 10, "tamano_figura": (3, 2.4)}}],
+    **{AJUSTES!r})
+sys.exit(0 if resultados[output_path] else 1)
+"""
+
+
+@pytest.fixture
+def render_gpx(tmp_path, write_gpx):
+    pytest.importorskip("motor_render")
+    import matplotlib as mpl
+    if shutil.which(mpl.rcParams["animation.ffmpeg_path"]) is None:
+        imageio_ffmpeg = pytest.importorskip("imageio_ffmpeg")
+        mpl.rcParams["animation.ffmpeg_path"] = imageio_ffmpeg.get_ffmpeg_exe()
+    elevations = [None] * 5 + [500 + 3 * (i % 40) for i in range(NUM_SEGMENTOS * FRAMES_POR_SEGMENTO - 5)]
+    return write_gpx(tmp_path / "GX010001.gpx", elevations)
+
+
+def _partes(output_path):
+    carpeta, nombre = os.path.split(str(output_path))
+    return os.path.join(carpeta, f".{nombre}.partes")
+
+
+def _segments_done(output_path):
+    try:
+        with open(os.path.join(_partes(output_path), "checkpoint.json"), encoding="utf-8") as f:
+            return len(json.load(f)["segmentos"])
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def _finished_segments(output_path):
+    return sorted(n for n in os.listdir(_partes(output_path)) if n.endswith(".mp4") and ".tmp" not in n)
+
+
+def _start(gpx_path, output_path, log):
+    # Output goes to a file: a full pipe would block the child while we poll
+    return subprocess.Popen([sys.executable, "-c", RENDER_SCRIPT, gpx_path, str(output_path)],
+                            cwd=REPO, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _render(gpx_path, output_path, tmp_path):
+    log_path = tmp_path / "render.log"
+    with open(log_path, "w", encoding="utf-8") as log:
+        returncode = _start(gpx_path, output_path, log).wait(timeout=300)
+    out = log_path.read_text(encoding="utf-8")
+    assert returncode == 0, out
+    return out
+
+
+def _kill_after_segments(gpx_path, output_path, tmp_path, segments, extra_delay_s=0.0):
+    """
+    Starts a render and SIGKILLs it once the checkpoint records `segments`
+    finished segments, plus extra_delay_s. Returns True if it was killed.
+    """
+    with open(tmp_path / "killed.log", "w", encoding="utf-8") as log:
+        proc = _start(gpx_path, output_path, log)
+        deadline = time.monotonic() + 300
+        while proc.poll() is None and time.monotonic() < deadline:
+            if _segments_done(output_path) >= segments:
+                time.sleep(extra_delay_s)
+                break
+            time.sleep(0.005)
+        killed = proc.poll() is None
+        if killed:
+            proc.send_signal(signal.SIGKILL)
+        proc.wait()
+    return killed
+
+
+def test_killed_render_resumes_to_identical_file(tmp_path, render_gpx):
+    reference = tmp_path / "reference.mp4"
+    _render(render_gpx, reference, tmp_path)
+
+    rng = random.Random(20240501)
+    output = tmp_path / "resumed.mp4"
+    kills = 0
+    for segments in sorted(rng.sample(range(1, NUM_SEGMENTOS - 1), 4)):
+        killed = _kill_after_segments(render_gpx, output, tmp_path, segments, rng.uniform(0, 0.05))
+        kills += killed
+        # Leftover segments only when the run was really cut short
+        assert os.path.isdir(_partes(output)) == killed
+        assert output.exists() == (not killed)
+        if not killed:
+            output.unlink()
+    assert kills >= 1
+
+    _render(render_gpx, output, tmp_path)
+
+    assert output.read_bytes() == reference.read_bytes()
+    assert not os.path.exists(_partes(output))
+
+
+def test_rewritten_gpx_with_same_content_keeps_segments(tmp_path, render_gpx):
+    output = tmp_path / "overlay.mp4"
+    _render(render_gpx, tmp_path / "reference.mp4", tmp_path)
+
+    assert _kill_after_segments(render_gpx, output, tmp_path, 3)
+
+    # The extraction step rewrites every GPX: same bytes, new mtime
+    with open(render_gpx, "rb") as f:
+        content = f.read()
+    with open(render_gpx, "wb") as f:
+        f.write(content)
+    os.utime(render_gpx, None)
+
+    out = _render(render_gpx, output, tmp_path)
+    assert "Reanudando" in out
+    assert output.read_bytes() == (tmp_path / "reference.mp4").read_bytes()
+
+
+def test_missing_basemap_keeps_segments_rendered_with_it(tmp_path, render_gpx, monkeypatch):
+    import matplotlib
+    matplotlib.use("Agg")
+    import motor_render
+
+    mapa_disponible = {"ok": True}
+
+    def add_basemap(ax, **kwargs):
+        if not mapa_disponible["ok"]:
+            raise ConnectionError("sin red")
+        ax.set_facecolor("lightgray")
+
+    monkeypatch.setattr(motor_render.cx, "add_basemap", add_basemap)
+    variante = {"map_source": "tiles", "grosor_linea": 4, "tamano_punto": 10, "tamano_figura": (3, 2.4)}
+    reference = str(tmp_path / "reference-gps.mp4")
+    output = str(tmp_path / "GX010001-gps.mp4")
+    assert motor_render.renderizar_variantes(render_gpx, [dict(variante, archivo_salida=reference)], **AJUSTES)[reference]
+
+    # Interrupt the render after three segments
+    dibujar_frame = motor_render.dibujar_frame
+
+    def interrumpir(track, artistas, frame_idx_anim):
+        if frame_idx_anim == 3 * FRAMES_POR_SEGMENTO + 7:
+            raise KeyboardInterrupt
+        dibujar_frame(track, artistas, frame_idx_anim)
+
+    monkeypatch.setattr(motor_render, "dibujar_frame", interrumpir)
+    with pytest.raises(KeyboardInterrupt):
+        motor_render.renderizar_variantes(render_gpx, [dict(variante, archivo_salida=output)], **AJUSTES)
+    monkeypatch.setattr(motor_render, "dibujar_frame", dibujar_frame)
+    segmentos = _finished_segments(output)
+    assert segmentos == ["seg_00000.mp4", "seg_00001.mp4", "seg_00002.mp4"]
+
+    # No tiles this time: the variant fails and the segments stay as they were
+    mapa_disponible["ok"] = False
+    resultados = motor_render.renderizar_variantes(render_gpx, [dict(variante, archivo_salida=output)], **AJUSTES)
+    assert resultados == {output: False}
+    assert not os.path.exists(output)
+    assert _finished_segments(output) == segmentos
+
+    # Tiles are back: it resumes and matches the uninterrupted render
+    mapa_disponible["ok"] = True
+    assert motor_render.renderizar_variantes(render_gpx, [dict(variante, archivo_salida=output)], **AJUSTES)[output]
+    with open(output, "rb") as f_out, open(reference, "rb") as f_ref:
+        assert f_out.read() == f_ref.read()
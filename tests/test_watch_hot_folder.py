@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import threading
+
+import watch_hot_folder
+
+
+def _make_clip(path, mtime_s, size=1024):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime_s, mtime_s))
+
+
+def _fake_extract(jobs):
+    def extract_fn(clip_path):
+        jobs.append(("extract", os.path.basename(clip_path)))
+        gpx_path = f"{os.path.splitext(clip_path)[0]}.gpx"
+        with open(gpx_path, "w", encoding="utf-8") as f:
+            f.write("<gpx/>")
+        return gpx_path
+    return extract_fn
+
+
+def _fake_render(jobs):
+    def render_fn(gpx_path):
+        jobs.append(("render", os.path.basename(gpx_path)))
+        with open(f"{os.path.splitext(gpx_path)[0]}-gps.mp4", "wb") as f:
+            f.write(b"\0")
+        return True
+    return render_fn
+
+
+def _watch(hot_folder, tmp_path, extract_fn, render_fns, stop_after_s):
+    stop_event = threading.Event()
+    timer = threading.Timer(stop_after_s, stop_event.set)
+    timer.start()
+    try:
+        return watch_hot_folder.watch_hot_folder(
+            str(hot_folder),
+            extract_fn=extract_fn,
+            render_fns=render_fns,
+            stable_seconds=0.3,
+            poll_interval_s=0.05,
+            status_path=str(tmp_path / "status.json"),
+            use_inotify=False,
+            stop_event=stop_event,
+            catalog_path=str(tmp_path / "catalog.json"),
+        )
+    finally:
+        timer.cancel()
+        stop_event.set()
+
+
+def test_newest_first_and_unstable_clips_skipped(tmp_path):
+    hot_folder = tmp_path / "ingest"
+    hot_folder.mkdir()
+    now = time.time()
+    _make_clip(hot_folder / "GX010001.MP4", now - 3600)
+    _make_clip(hot_folder / "GX010002.MP4", now - 60)
+
+    # A clip still being copied never settles
+    growing = hot_folder / "GX010003.MP4"
+    _make_clip(growing, now)
+    copying = threading.Event()
+
+    def keep_writing():
+        with open(growing, "ab") as f:
+            while not copying.wait(0.05):
+                f.write(b"\0" * 4096)
+                f.flush()
+
+    writer = threading.Thread(target=keep_writing)
+    writer.start()
+    jobs = []
+    try:
+        status = _watch(hot_folder, tmp_path, _fake_extract(jobs), [_fake_render(jobs)], 2.0)
+    finally:
+        copying.set()
+        writer.join()
+
+    # Fresh footage goes first, including its render, before older clips
+    assert jobs == [
+        ("extract", "GX010002.MP4"),
+        ("render", "GX010002.gpx"),
+        ("extract", "GX010001.MP4"),
+        ("render", "GX010001.gpx"),
+    ]
+    assert not (hot_folder / "GX010003.gpx").exists()
+
+    with open(tmp_path / "status.json", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved == status
+    assert saved["state"] == "stopped"
+    assert saved["mode"] == "polling"
+    assert saved["extracted"] == 2
+    assert saved["rendered"] == 2
+    assert saved["failed"] == 0
+    assert saved["queue_depth"] == 0
+    assert saved["waiting_to_settle"] == 1
+    assert os.path.exists(tmp_path / "catalog.json")
+
+
+def test_vanished_clip_fails_one_job(tmp_path):
+    hot_folder = tmp_path / "ingest"
+    hot_folder.mkdir()
+    now = time.time()
+    _make_clip(hot_folder / "GX010001.MP4", now - 3600)
+    _make_clip(hot_folder / "GX010002.MP4", now - 60)
+    jobs = []
+    extract = _fake_extract(jobs)
+
+    def extract_and_move(clip_path):
+        gpx_path = extract(clip_path)
+        if clip_path.endswith("GX010002.MP4"):
+            os.remove(clip_path)
+        return gpx_path
+
+    status = _watch(hot_folder, tmp_path, extract_and_move, [], 1.5)
+
+    assert jobs == [("extract", "GX010002.MP4"), ("extract", "GX010001.MP4")]
+    assert status["extracted"] == 1
+    assert status["failed"] == 1
+
+
+def test_missing_extractor_stops_watcher(tmp_path):
+    hot_folder = tmp_path / "ingest"
+    hot_folder.mkdir()
+    _make_clip(hot_folder / "GX010001.MP4", time.time() - 60)
+    calls = []
+
+    def extract_fn(clip_path):
+        calls.append(clip_path)
+        raise FileNotFoundError("gopro2gpx")
+
+    started = time.monotonic()
+    status = _watch(hot_folder, tmp_path, extract_fn, [], 5.0)
+
+    assert len(calls) == 1
+    assert status["state"] == "stopped"
+    assert time.monotonic() - started < 4.0
+
+
+def test_render_uses_the_gpx_linked_by_the_catalog(tmp_path):
+    hot_folder = tmp_path / "ingest"
+    hot_folder.mkdir()
+    _make_clip(hot_folder / "GX010005.MP4", time.time() - 60)
+    # Extracted earlier under the camera-independent name
+    (hot_folder / "010005.gpx").write_text("<gpx/>", encoding="utf-8")
+    jobs = []
+
+    status = _watch(hot_folder, tmp_path, _fake_extract(jobs), [_fake_render(jobs)], 1.0)
+
+    assert jobs == [("render", "010005.gpx")]
+    assert status["rendered"] == 1
+    assert status["failed"] == 0
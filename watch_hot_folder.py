@@ -0,0 +1,325 @@
+# Filename: watch_hot_folder.py
+import os
+import sys
+import json
+import time
+import heapq
+import select
+import ctypes
+import ctypes.util
+
+import media_catalog
+
+# inotify flags (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# Stages of a clip, in the order they run
+STAGE_EXTRACT = "extract"
+STAGE_RENDER = "render"
+
+
+class ExtractorMissingError(Exception):
+    """The extraction tool itself is not installed: no clip can succeed."""
+
+
+class InotifyWatcher:
+    """
+    Minimal inotify wrapper (Linux only). It is only used as a wake-up signal:
+    the actual state of the folder always comes from the media catalog.
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify is not available on this platform")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched = set()
+
+    def watch_directories(self, paths):
+        for path in paths:
+            if path in self._watched:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                # Usually fs.inotify.max_user_watches; the caller falls back to polling
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+            self._watched.add(path)
+
+    def wait(self, timeout_s):
+        """Blocks up to timeout_s seconds. Returns True if something changed."""
+        ready, _, _ = select.select([self._fd], [], [], timeout_s)
+        if not ready:
+            return False
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self._fd)
+
+
+def _catalog_directories(catalog):
+    return [os.path.join(catalog["root"], rel_dir) for rel_dir in catalog["directories"]]
+
+
+def _write_status(status_path, status):
+    if not status_path:
+        return
+    tmp_path = f"{status_path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f, indent=4)
+        os.replace(tmp_path, status_path)
+    except OSError as e:
+        print(f"WARNING: Could not write status file '{status_path}': {e}")
+
+
+def watch_hot_folder(hot_folder,
+                     extract_fn,
+                     render_fns=(),
+                     stable_seconds=30.0,
+                     poll_interval_s=5.0,
+                     status_path="watch_status.json",
+                     use_inotify=True,
+                     stop_event=None,
+                     max_cycles=None,
+                     catalog_path=None):
+    """
+    Watches hot_folder for new .MP4 clips and runs extraction and rendering on
+    them as they become ready.
+
+    A clip is ready once its size and mtime have stayed the same for
+    stable_seconds, so files still being copied from a card are skipped. Jobs
+    are taken newest clip first; a clip's render job is queued after its
+    extraction succeeds, so fresh footage can overtake older renders.
+
+    Args:
+        hot_folder (str): Folder to watch (subfolders included).
+        extract_fn (callable): extract_fn(mp4_path) -> GPX path or None.
+        render_fns (iterable): Callables render_fn(gpx_path) -> bool, run in order.
+        stable_seconds (float): Time a clip must stay unchanged before processing.
+        poll_interval_s (float): Polling period, and the longest inotify wait.
+        status_path (str): JSON file with queue depth and throughput (None disables it).
+        use_inotify (bool): Use inotify if available; otherwise poll.
+        stop_event (threading.Event): Stops the loop when set.
+        max_cycles (int): Stop after this many idle cycles (None runs forever).
+        catalog_path (str): Where to keep the media catalog (None uses the default cache).
+
+    Returns:
+        dict: The last status written.
+    """
+    render_fns = list(render_fns)
+    print(f"Watching hot folder: {hot_folder}")
+
+    watcher = None
+    if use_inotify:
+        try:
+            watcher = InotifyWatcher()
+        except OSError as e:
+            print(f"INFO: inotify not available ({e}). Polling every {poll_interval_s} s.")
+
+    queue = []                 # heap of (-clip_mtime_ns, stage_order, clip_path, stage, gpx_path)
+    queued = set()             # (clip_path, stage) currently in the queue
+    seen = {}                  # clip_path -> ((size, mtime_ns), monotonic time first seen so)
+    handled = set()            # (clip_path, stage) done or failed during this session
+    counters = {"extracted": 0, "rendered": 0, "failed": 0, "bytes_extracted": 0}
+    started_at = time.time()
+    busy_seconds = 0.0
+    idle_cycles = 0
+    status = {}
+
+    def enqueue(clip_path, stage, mtime_ns, gpx_path=None):
+        if (clip_path, stage) in queued or (clip_path, stage) in handled:
+            return
+        order = 0 if stage == STAGE_EXTRACT else 1
+        heapq.heappush(queue, (-mtime_ns, order, clip_path, stage, gpx_path))
+        queued.add((clip_path, stage))
+
+    def update_status(state, current=None):
+        elapsed_h = max(time.time() - started_at, 1e-6) / 3600.0
+        jobs_done = counters["extracted"] + counters["rendered"]
+        status.clear()
+        status.update({
+            "hot_folder": os.path.abspath(hot_folder),
+            "state": state,
+            "current": current,
+            "queue_depth": len(queue),
+            "waiting_to_settle": len(seen),
+            "extracted": counters["extracted"],
+            "rendered": counters["rendered"],
+            "failed": counters["failed"],
+            "jobs_per_hour": round(jobs_done / elapsed_h, 2),
+            "ingest_mb_per_s": round(counters["bytes_extracted"] / 1e6 / busy_seconds, 2) if busy_seconds > 0 else 0.0,
+            "mode": "inotify" if watcher else "polling",
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started_at)),
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        _write_status(status_path, status)
+
+    def refresh_candidates():
+        nonlocal watcher
+        catalog = media_catalog.update_catalog(hot_folder, catalog_path=catalog_path, verbose=False)
+        if watcher:
+            try:
+                watcher.watch_directories(_catalog_directories(catalog))
+            except OSError as e:
+                print(f"WARNING: {e}. Switching to polling.")
+                watcher.close()
+                watcher = None
+
+        for clip_path in media_catalog.files_of_kind(catalog, "clip"):
+            derived = media_catalog.derived_files(catalog, clip_path)
+            if derived["gpx"] is None:
+                if (clip_path, STAGE_EXTRACT) not in handled and (clip_path, STAGE_EXTRACT) not in queued:
+                    seen.setdefault(clip_path, (None, None))
+            elif render_fns and not derived["overlays"]:
+                try:
+                    # The catalog may link a GPX not named after the clip (010001.gpx -> GX010001.MP4)
+                    enqueue(clip_path, STAGE_RENDER, os.stat(clip_path).st_mtime_ns, derived["gpx"])
+                except OSError:
+                    pass
+
+    def check_stability():
+        now = time.monotonic()
+        for clip_path in list(seen):
+            try:
+                st = os.stat(clip_path)
+            except OSError:
+                del seen[clip_path]
+                continue
+            signature = (st.st_size, st.st_mtime_ns)
+            last_signature, since = seen[clip_path]
+            if signature != last_signature:
+                seen[clip_path] = (signature, now)
+            elif now - since >= stable_seconds:
+                del seen[clip_path]
+                enqueue(clip_path, STAGE_EXTRACT, st.st_mtime_ns)
+
+    def run_job(clip_path, stage, gpx_path):
+        nonlocal busy_seconds
+        update_status("processing", current=f"{stage}: {clip_path}")
+        job_start = time.monotonic()
+        handled.add((clip_path, stage))
+        try:
+            if stage == STAGE_EXTRACT:
+                try:
+                    gpx_path = extract_fn(clip_path)
+                except FileNotFoundError as e:
+                    # gopro2gpx not installed; a clip that vanished only fails its own job
+                    raise ExtractorMissingError(e) from e
+                if gpx_path:
+                    st = os.stat(clip_path)
+                    counters["extracted"] += 1
+                    counters["bytes_extracted"] += st.st_size
+                    if render_fns:
+                        enqueue(clip_path, STAGE_RENDER, st.st_mtime_ns, gpx_path)
+                else:
+                    counters["failed"] += 1
+            else:
+                if all([render_fn(gpx_path) for render_fn in render_fns]):
+                    counters["rendered"] += 1
+                else:
+                    counters["failed"] += 1
+        except ExtractorMissingError:
+            raise
+        except Exception as e:
+            print(f"  ERROR: {stage} failed for {clip_path}: {e}")
+            counters["failed"] += 1
+        finally:
+            busy_seconds += time.monotonic() - job_start
+
+    try:
+        refresh_candidates()
+        while not (stop_event and stop_event.is_set()):
+            check_stability()
+
+            if queue:
+                _, _, clip_path, stage, gpx_path = heapq.heappop(queue)
+                queued.discard((clip_path, stage))
+                run_job(clip_path, stage, gpx_path)
+                refresh_candidates()
+                continue
+
+            update_status("idle")
+            idle_cycles += 1
+            if max_cycles is not None and idle_cycles >= max_cycles:
+                break
+
+            # Wake up early for clips that are about to settle
+            timeout_s = poll_interval_s
+            if seen:
+                timeout_s = min(timeout_s, max(0.05, stable_seconds / 4))
+
+            if watcher:
+                if watcher.wait(timeout_s):
+                    refresh_candidates()
+            else:
+                if stop_event:
+                    stop_event.wait(timeout_s)
+                else:
+                    time.sleep(timeout_s)
+                refresh_candidates()
+    except ExtractorMissingError as e:
+        print(f"CRITICAL ERROR: {e}. Stopping the watcher.")
+    finally:
+        if watcher:
+            watcher.close()
+
+    update_status("stopped")
+    print("\n--- Watch Summary ---")
+    print(f"Extracted: {counters['extracted']}, rendered: {counters['rendered']}, failed: {counters['failed']}.")
+    return status
+
+
+if __name__ == "__main__":
+    from extract_gopro_telemetry import generate_gpx_for_clip
+    from animate_gpx_map import animar_ruta_gpx_sincronizada
+    import contextily as cx
+
+    # --- CONFIGURATION ---
+    hot_folder = "/Volumes/LaCie/GoPro/Ingest"
+    status_file = "watch_status.json"
+    stable_seconds = 30.0       # Un clip se procesa cuando lleva este tiempo sin cambiar
+    poll_interval_s = 5.0
+    render_overlays = True
+    # --- END CONFIGURATION ---
+
+    def render_map_overlay(gpx_path):
+        return animar_ruta_gpx_sincronizada(
+            ruta_archivo_gpx=gpx_path,
+            archivo_salida_video=f"{os.path.splitext(gpx_path)[0]}-gps.mp4",
+            intervalo_frames_ms_referencia=50,
+            puntos_gpx_por_frame_anim=5,
+            segundos_inicio_dibujo=0,
+            map_source=cx.providers.OpenStreetMap.Mapnik,
+            ventana_promedio_altura_puntos=10,
+            umbral_actualizacion_altura_m=25.0,
+            grosor_linea=12,
+            tamano_punto=16
+        )
+
+    if not os.path.isdir(hot_folder):
+        print(f"Error: The hot folder '{hot_folder}' does not exist or is not a directory.")
+    else:
+        try:
+            watch_hot_folder(hot_folder,
+                             extract_fn=generate_gpx_for_clip,
+                             render_fns=[render_map_overlay] if render_overlays else [],
+                             stable_seconds=stable_seconds,
+                             poll_interval_s=poll_interval_s,
+                             status_path=status_file)
+        except KeyboardInterrupt:
+            print("\nWatcher stopped by user.")